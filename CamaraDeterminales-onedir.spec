@@ -0,0 +1,65 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Perfil onedir recortado: arranca más rápido que --onefile porque no hay que
+# descomprimir todo en /tmp en cada inicio.
+#   pyinstaller CamaraDeterminales-onedir.spec
+#   ./dist/CamaraDeterminales/CamaraDeterminales
+from PyInstaller.utils.hooks import collect_data_files
+
+# ttkbootstrap solo necesita sus datos (temas, traducciones); PIL lo cubren los
+# hooks de PyInstaller (PIL.ImageTk incluido), sin --collect-all
+datas = collect_data_files('ttkbootstrap')
+
+# Paquetes que arrastran las dependencias pero la aplicación no usa
+excludes = [
+    'matplotlib', 'scipy', 'pandas', 'IPython', 'jupyter', 'notebook',
+    'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'tkinter.test', 'lib2to3',
+    'pydoc_data', 'PIL.ImageQt', 'numpy.distutils', 'numpy.f2py',
+]
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=datas,
+    # Importados dentro de funciones (carga diferida en main.py)
+    hiddenimports=['camera_service', 'capture_sources', 'storage_backends', 'content_store',
+                   'frame_pool', 'frame_stages', 'recorder', 'auto_trigger', 'code_reader',
+                   'startup_profile', 'PIL.ImageTk'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=excludes,
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='CamaraDeterminales',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    # Sin UPX: descomprimir las bibliotecas en cada inicio cuesta más de lo que ahorra
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='CamaraDeterminales',
+)
@@ -0,0 +1,131 @@
+import os
+import json
+import copy
+
+# Archivo de configuración junto al directorio de trabajo
+CONFIG_FILE = os.path.join(os.getcwd(), "config.json")
+
+# Valores por defecto (se combinan con lo que haya en config.json)
+DEFAULT_CONFIG = {
+    "storage": {
+        # "local" o "s3" (cualquier servicio compatible: MinIO, Ceph, AWS...)
+        "backend": "local",
+        "path": None,  # None = ./capturas
+        # Guardar capturas por contenido (BLAKE2b) con manifiesto para sincronizar
+        "content_addressed": False,
+        "station_id": None,  # None = nombre del equipo
+        "s3": {
+            "endpoint": "http://localhost:9000",
+            "bucket": "capturas",
+            "access_key": "",
+            "secret_key": "",
+            "region": "us-east-1",
+            "prefix": "",
+            "outbox": None,  # None = <carpeta>/.outbox
+            "keep_local": True,
+            "max_bytes_per_sec": None,  # None = sin límite
+            "batch_size": 32,
+            "multipart_threshold": 8 * 1024 * 1024,
+            "part_size": 8 * 1024 * 1024
+        }
+    },
+    "encoding": {
+        # Procesos para codificar PNG/JPEG (None = todos los núcleos, 0 = desactivado)
+        "processes": None,
+        # Slots de memoria compartida para frames en vuelo
+        "slots": 8
+    },
+    "camera": {
+        # Archivo de perfiles por dispositivo (None = ./camera_profiles.json)
+        "profiles": None,
+        # Mantener el dispositivo abierto al detener la vista previa (reanudar al instante)
+        "keep_open": False,
+        # Fuente de captura: "auto" (detección por sistema), "v4l2", "gstreamer",
+        # "file" (video) o "folder" (carpeta de imágenes)
+        "source": {
+            "type": "auto",
+            "device": None,     # v4l2: ej. "/dev/video0" (None = buscar)
+            "pipeline": "",     # gstreamer: pipeline terminado en appsink
+            "path": None,       # file/folder
+            "realtime": True,   # file/folder: False = lo más rápido posible
+            "loop": False,      # file/folder: volver a empezar al terminar
+            "fps": 30           # folder: velocidad de reproducción
+        }
+    },
+    "recording": {
+        "enabled": False,
+        # "trigger": solo al disparar (con buffer previo) | "continuous": siempre
+        "mode": "trigger",
+        "folder": None,  # None = <carpeta de capturas>/videos
+        "fps": 30,
+        "pre_seconds": 5,
+        "post_seconds": 5,
+        "segment_seconds": 60,
+        "codec": "mp4v",
+        "extension": ".mp4",
+        "retention_segments": 100,
+        "retention_hours": 24,
+        "buffer_quality": 80
+    },
+    "auto_trigger": {
+        "enabled": False,
+        "width": 160,                # ancho de la imagen reducida para el análisis
+        "pixel_threshold": 25,       # diferencia de gris para contar un píxel como cambiado
+        "motion_threshold": 0.02,    # fracción de píxeles cambiados = movimiento
+        "presence_threshold": 0.03,  # fracción distinta al fondo = hay pieza
+        "settle_seconds": 0.8        # tiempo quieto antes de capturar
+    },
+    "code_reader": {
+        "enabled": False,
+        "action": "fill",       # "fill": llena el número de parte | "capture": además captura
+        "width": 640,           # ancho de la imagen reducida donde se busca el código
+        "max_rate": 4,          # lecturas por segundo como máximo
+        "stable_frames": 3,     # lecturas iguales seguidas para aceptar un código
+        "rearm_misses": 8,      # lecturas fallidas seguidas para volver a aceptar el mismo código
+        "barcodes": True        # también códigos de barras (OpenCV >= 4.8)
+    },
+    "capture": {
+        # ROI por cámara: {"<id de cámara>": [x, y, ancho, alto]} en píxeles del frame
+        "roi": {},
+        # Reducción de la imagen guardada (1 = tamaño original, 2 = mitad, ...)
+        "downscale": 1
+    }
+}
+
+
+def _merge(base, override):
+    """Combina diccionarios de forma recursiva (override gana)"""
+    result = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def load_config(path=None):
+    """Carga la configuración, usando valores por defecto si no existe"""
+    path = path or CONFIG_FILE
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer la configuración ({path}): {e}")
+    return _merge(DEFAULT_CONFIG, data)
+
+
+def save_config(config, path=None):
+    """Guarda la configuración de forma atómica"""
+    path = path or CONFIG_FILE
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error al guardar configuración: {e}")
+        return False
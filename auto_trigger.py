@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+# Estados (también se muestran en la interfaz)
+IDLE = "Esperando pieza"
+MOTION = "Movimiento"
+SETTLING = "Estabilizando"
+PENDING = "Capturando"
+CAPTURED = "Capturado"
+
+
+class MotionTrigger:
+    """Disparo automático por movimiento + escena estable.
+
+    Trabaja sobre frames reducidos en escala de grises (unos 160 px de ancho)
+    con diferencias vectorizadas de NumPy. Dispara cuando, tras un movimiento,
+    la escena queda quieta settle_seconds y es distinta tanto del fondo vacío
+    como de la última pieza capturada.
+
+    Al disparar queda en PENDING hasta que la aplicación confirme la captura
+    (confirm) o avise que no se pudo (cancel, p. ej. falta el número de
+    parte); recién con confirm la pieza cuenta como capturada. Tras cancel
+    vuelve a intentar cuando la escena siga quieta otros settle_seconds.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, motion_threshold=0.02,
+                 presence_threshold=0.03, settle_seconds=0.8, background_rate=0.05):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.motion_threshold = motion_threshold
+        self.presence_threshold = presence_threshold
+        self.settle_seconds = settle_seconds
+        self.background_rate = background_rate
+        self.reset()
+
+    def reset(self):
+        self.state = IDLE
+        self.previous = None
+        self.background = None
+        self.last_captured = None
+        self.candidate = None
+        self.settle_start = 0
+        self.motion = 0.0
+
+    def _small_gray(self, frame):
+        """Reduce por muestreo y convierte a gris con pesos enteros (BGR)"""
+        step = max(1, frame.shape[1] // self.width)
+        small = frame[::step, ::step]
+        if small.ndim == 2:
+            return small.astype(np.int16)
+        b, g, r = small[..., 0], small[..., 1], small[..., 2]
+        return ((b.astype(np.uint16) * 29 + g.astype(np.uint16) * 150 +
+                 r.astype(np.uint16) * 77) >> 8).astype(np.int16)
+
+    def _changed(self, a, b):
+        """Fracción de píxeles que cambian más de pixel_threshold"""
+        if a is None or b is None or a.shape != b.shape:
+            return 1.0
+        return float(np.count_nonzero(np.abs(a - b) > self.pixel_threshold)) / a.size
+
+    def confirm(self):
+        """La captura disparada se guardó: recordar la pieza"""
+        if self.state == PENDING:
+            self.state = CAPTURED
+            self.last_captured = self.candidate
+        self.candidate = None
+
+    def cancel(self, now=None):
+        """La captura disparada no se hizo: reintentar tras settle_seconds"""
+        if self.state == PENDING:
+            self.state = SETTLING
+            self.settle_start = time.monotonic() if now is None else now
+        self.candidate = None
+
+    def update(self, frame, now=None):
+        """Procesa un frame; retorna True cuando hay que capturar"""
+        now = time.monotonic() if now is None else now
+        gray = self._small_gray(frame)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.previous = gray
+            return False
+
+        self.motion = self._changed(gray, self.previous)
+        self.previous = gray
+        moving = self.motion > self.motion_threshold
+
+        if self.state == PENDING:
+            # Esperando confirm()/cancel() de la captura en curso
+            return False
+
+        if self.state in (IDLE, CAPTURED):
+            if moving:
+                self.state = MOTION
+            elif self.state == IDLE:
+                # Escena vacía y quieta: el fondo se adapta a cambios de luz lentos
+                self.background += self.background_rate * (gray - self.background)
+
+        elif self.state == MOTION:
+            if not moving:
+                self.state = SETTLING
+                self.settle_start = now
+
+        elif self.state == SETTLING:
+            if moving:
+                self.state = MOTION
+            elif now - self.settle_start >= self.settle_seconds:
+                background = self.background.astype(np.int16)
+                if self._changed(gray, background) <= self.presence_threshold:
+                    # Volvió el fondo: se retiró la pieza (o solo pasó una mano)
+                    self.state = IDLE
+                    self.last_captured = None
+                elif self._changed(gray, self.last_captured) > self.presence_threshold:
+                    self.state = PENDING
+                    self.candidate = gray
+                    return True
+                else:
+                    # Misma pieza que ya se capturó
+                    self.state = CAPTURED
+        return False
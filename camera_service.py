@@ -1,16 +1,200 @@
 import cv2
+import os
+import json
 import platform
 
+from frame_pool import FrameBufferPool
+from capture_sources import SOURCE_TYPES, list_sources, open_source
+
+# Perfil por defecto de cada dispositivo. None = no tocar (modo automático)
+DEFAULT_PROFILE = {
+    "api": None,            # backend de OpenCV que funcionó la última vez
+    "width": 1280,
+    "height": 720,
+    "fps": 30,
+    "fourcc": None,         # ej. "MJPG"
+    "exposure": None,       # valor manual => exposición automática desactivada
+    "focus": None,          # valor manual => autofoco desactivado
+    "white_balance": None,  # temperatura (K) => balance automático desactivado
+    "gain": None
+}
+
 class CameraService:
-    def __init__(self):
+    # Controles manuales que se pueden fijar en el perfil (en orden de aplicación)
+    CONTROLS = {
+        "exposure": cv2.CAP_PROP_EXPOSURE,
+        "focus": cv2.CAP_PROP_FOCUS,
+        "white_balance": cv2.CAP_PROP_WB_TEMPERATURE,
+        "gain": cv2.CAP_PROP_GAIN
+    }
+
+    def __init__(self, profiles_path=None, keep_open=False, source=None):
         self.cap = None
         self.index = None
+        self.api = None
         self.system = platform.system()  # Detecta el sistema operativo
+        
+        # Fuente de captura: "auto" = detección por sistema operativo (ver capture_sources)
+        self.source = dict(source or {})
+        self.source_type = self.source.get("type", "auto")
+        if self.source_type not in SOURCE_TYPES:
+            message = (f"Tipo de fuente desconocido en camera.source.type: {self.source_type!r} "
+                       f"(válidos: {', '.join(SOURCE_TYPES)})")
+            print(f"❌ {message}")
+            raise ValueError(message)
+        
+        # Perfiles por dispositivo persistidos en disco
+        self.profiles_path = profiles_path or os.path.join(os.getcwd(), "camera_profiles.json")
+        self.profiles = self._load_profiles()
+        
+        # Mantener el dispositivo abierto en pausa para reanudar al instante
+        self.keep_open = keep_open
+        self.paused = False
+        
+        # Grabador de video opcional (recibe cada frame leído)
+        self.recorder = None
+        
+        # Buffers reciclados para las lecturas (evita ~2.7 MB nuevos por frame)
+        self.buffers = FrameBufferPool()
+
+    # --- Perfiles de dispositivo ---
+    def _load_profiles(self):
+        if not os.path.exists(self.profiles_path):
+            return {}
+        try:
+            with open(self.profiles_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ No se pudieron leer los perfiles de cámara: {e}")
+            return {}
+
+    def save_profiles(self):
+        tmp_path = self.profiles_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.profiles, f, indent=2)
+            os.replace(tmp_path, self.profiles_path)
+        except Exception as e:
+            print(f"Error al guardar perfiles de cámara: {e}")
+
+    def get_profile(self, camera_id):
+        """Perfil del dispositivo combinado con los valores por defecto"""
+        profile = dict(DEFAULT_PROFILE)
+        profile.update(self.profiles.get(str(camera_id), {}))
+        return profile
+
+    def update_profile(self, camera_id, **values):
+        profile = self.profiles.setdefault(str(camera_id), {})
+        if all(profile.get(k) == v for k, v in values.items()):
+            return  # Sin cambios: no reescribir el archivo
+        profile.update(values)
+        self.save_profiles()
+
+    def apply_profile(self, profile):
+        """Aplica todo el perfil en una sola pasada (el orden importa)"""
+        cap = self.cap
+        # FOURCC antes de la resolución: algunos drivers la limitan según el formato
+        if profile.get("fourcc"):
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile["fourcc"]))
+        if profile.get("width") and profile.get("height"):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile["width"])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile["height"])
+        if profile.get("fps"):
+            cap.set(cv2.CAP_PROP_FPS, profile["fps"])
+        
+        # Controles manuales bloqueados para imágenes repetibles
+        for name, prop in self.CONTROLS.items():
+            if profile.get(name) is not None:
+                self._set_manual(name)
+                cap.set(prop, profile[name])
+
+    def _set_manual(self, name):
+        """Desactiva el modo automático del control (los drivers UVC rechazan
+        escribir exposición/foco mientras está activo)"""
+        if name == "exposure":
+            # V4L2: 1 = manual; DSHOW/MSMF: 0.25 = manual
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1 if self.system == "Linux" else 0.25)
+        elif name == "focus":
+            self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        elif name == "white_balance":
+            self.cap.set(cv2.CAP_PROP_AUTO_WB, 0)
+
+    def _set_auto(self, name):
+        """Vuelve el control a modo automático"""
+        if name == "exposure":
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 3 if self.system == "Linux" else 0.75)
+        elif name == "focus":
+            self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+        elif name == "white_balance":
+            self.cap.set(cv2.CAP_PROP_AUTO_WB, 1)
+
+    def lock_current_settings(self):
+        """Guarda la exposición/foco/balance/ganancia actuales como valores fijos.
+
+        Primero se leen todos los valores (elegidos por el modo automático),
+        luego se pasa cada control a manual y se escribe su valor: solo se
+        guardan los que el backend acepta. No se filtra por signo: en
+        DSHOW/MSMF la exposición es log2(segundos), siempre negativa, y una
+        ganancia 0 es válida.
+        """
+        if not self.cap or self.index is None:
+            return None
+        current = {}
+        for name, prop in self.CONTROLS.items():
+            value = self.cap.get(prop)
+            # V4L2 devuelve -1 en controles inexistentes (sus valores válidos son >= 0)
+            if self.system == "Linux" and value == -1:
+                continue
+            current[name] = value
+
+        values = {}
+        for name, value in current.items():
+            self._set_manual(name)
+            if self.cap.set(self.CONTROLS[name], value):
+                values[name] = value
+            else:
+                self._set_auto(name)  # No soportado: no dejarlo en manual
+        self.update_profile(self.index, **values)
+        return values
+
+    def unlock_settings(self):
+        """Vuelve a modo automático y olvida los valores fijos del perfil"""
+        if self.index is None:
+            return
+        self.update_profile(self.index, exposure=None, focus=None, white_balance=None, gain=None)
+        if self.cap:
+            for name in self.CONTROLS:
+                self._set_auto(name)
+
+    def _open_with_profile(self, camera_id, profile):
+        """Abre directamente con el backend recordado, sin recorrer el fallback"""
+        api = profile.get("api")
+        if api is None:
+            return False
+        self.cap = cv2.VideoCapture(camera_id, api)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            return False
+        self.index = camera_id
+        self.api = api
+        self.apply_profile(profile)
+        if self.system == "Linux":
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        print(f"✅ Cámara {camera_id} iniciada con perfil guardado (api {api})")
+        return True
 
     def find_cameras(self):
         """Retorna una lista de índices de cámaras disponibles"""
         cameras = []
         
+        # Un dispositivo en pausa sigue abierto y no se podría sondear
+        if self.paused:
+            self.stop()
+        
+        if self.source_type != "auto":
+            return list_sources(self.source)
+        
         # Diferentes métodos según el sistema operativo
         if self.system == "Windows":
             # Windows - probar con DSHOW
@@ -66,10 +250,23 @@ class CameraService:
 
     def start(self, camera_id):
         """Inicia la cámara seleccionada"""
+        # Arranque en caliente: el dispositivo sigue abierto desde la pausa
+        if self.paused and self.cap and self.cap.isOpened() and camera_id == self.index:
+            self.paused = False
+            self.cap.grab()  # Descartar el frame viejo que quedó en el buffer
+            print(f"✅ Cámara {camera_id} reanudada")
+            return True
+        
         self.stop()  # Detener cualquier cámara previa
         
         print(f"🔧 Intentando iniciar cámara: {camera_id} en {self.system}")
         
+        profile = self.get_profile(camera_id)
+        if self.source_type != "auto":
+            return self._start_source(camera_id, profile)
+        if self._open_with_profile(camera_id, profile):
+            return True
+        
         if self.system == "Windows":
             # Intentar con DSHOW primero, luego MSMF
             for api in [cv2.CAP_DSHOW, cv2.CAP_MSMF]:
@@ -77,10 +274,10 @@ class CameraService:
                 if self.cap.isOpened():
                     print(f"✅ Cámara {camera_id} iniciada con {api}")
                     self.index = camera_id
-                    # Configurar propiedades básicas
-                    self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                    self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                    self.cap.set(cv2.CAP_PROP_FPS, 30)
+                    self.api = api
+                    # Configurar propiedades del perfil y recordar el backend
+                    self.apply_profile(profile)
+                    self.update_profile(camera_id, api=api)
                     return True
                 if self.cap:
                     self.cap.release()
@@ -88,7 +285,8 @@ class CameraService:
         elif self.system == "Linux":
             # Si camera_id es un string como "/dev/video0", usarlo directamente
             if isinstance(camera_id, str) and camera_id.startswith("/dev/video"):
-                self.cap = cv2.VideoCapture(camera_id, cv2.CAP_V4L2)
+                api = cv2.CAP_V4L2
+                self.cap = cv2.VideoCapture(camera_id, api)
             else:
                 # Probar diferentes APIs para Linux
                 for api in [cv2.CAP_V4L2, cv2.CAP_ANY]:
@@ -99,10 +297,10 @@ class CameraService:
             if self.cap and self.cap.isOpened():
                 print(f"✅ Cámara {camera_id} iniciada en Linux")
                 self.index = camera_id
-                # Configurar propiedades para Raspberry Pi
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                self.cap.set(cv2.CAP_PROP_FPS, 30)
+                self.api = api
+                # Configurar propiedades del perfil y recordar el backend
+                self.apply_profile(profile)
+                self.update_profile(camera_id, api=api)
                 # Añadir buffers para mejor rendimiento
                 self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
                 return True
@@ -112,6 +310,9 @@ class CameraService:
             if self.cap.isOpened():
                 print(f"✅ Cámara {camera_id} iniciada en macOS")
                 self.index = camera_id
+                self.api = cv2.CAP_ANY
+                self.apply_profile(profile)
+                self.update_profile(camera_id, api=cv2.CAP_ANY)
                 return True
         
         # Si llegamos aquí, falló
@@ -121,13 +322,51 @@ class CameraService:
         print(f"❌ No se pudo iniciar la cámara {camera_id}")
         return False
 
+    def _start_source(self, camera_id, profile):
+        """Abre la fuente configurada (V4L2, GStreamer, video o carpeta)"""
+        try:
+            self.cap = open_source(self.source, camera_id)
+        except Exception as e:
+            print(f"❌ No se pudo abrir la fuente {self.source_type}: {e}")
+            self.cap = None
+            return False
+        
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            print(f"❌ No se pudo abrir la fuente {self.source_type}: {camera_id}")
+            return False
+        
+        self.index = camera_id
+        self.api = self.source_type
+        if self.source_type == "v4l2":
+            # En GStreamer el formato lo define el pipeline; en archivos no aplica
+            self.apply_profile(profile)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        print(f"✅ Fuente {self.source_type} iniciada: {camera_id}")
+        return True
+
+    @property
+    def fast_replay(self):
+        """True si la fuente es un archivo/carpeta reproducido sin esperar sus fps"""
+        return bool(self.cap) and not getattr(self.cap, "live", True) and \
+            not getattr(self.cap, "realtime", True)
+
     def get_frame(self):
-        """Obtiene un frame de la cámara"""
+        """Obtiene un frame de la cámara.
+
+        El frame es una vista de solo lectura de un buffer reutilizable: hay
+        que devolverlo con release_frame() al terminar (y copiarlo si se
+        quiere modificar).
+        """
         if not self.cap:
             return None
         
-        # Leer frame
-        ret, frame = self.cap.read()
+        # Leer frame en un buffer del pool
+        ret, frame = self.buffers.read(self.cap)
+        
+        if not ret and getattr(self.cap, "finished", False):
+            return None  # Fin del video/carpeta: no hay nada que reconectar
         
         if not ret:
             print("⚠️ No se pudo leer frame, reintentando...")
@@ -135,16 +374,68 @@ class CameraService:
             self.cap.release()
             if self.index is not None:
                 self.start(self.index)
-                ret, frame = self.cap.read() if self.cap else (False, None)
+                ret, frame = self.buffers.read(self.cap) if self.cap else (False, None)
         
+        if ret and self.recorder:
+            self.recorder.push(frame)
         return frame if ret else None
 
+    def release_frame(self, frame):
+        """Devuelve al pool un frame obtenido con get_frame()"""
+        self.buffers.release(frame)
+
+    def get_frame_slot(self, pool):
+        """Lee un frame directamente en un slot de un SharedFramePool.
+
+        Retorna el índice del slot (con una referencia que el llamador debe
+        soltar con pool.release) o None si no hay slot libre o falla la lectura.
+        """
+        if not self.cap:
+            return None
+        
+        idx = pool.acquire()
+        if idx is None:
+            return None
+        
+        slot = pool.view(idx)
+        ret, frame = self.cap.read(slot)
+        if ret and frame is not None and frame.ctypes.data != slot.ctypes.data:
+            # OpenCV reasignó el buffer (resolución distinta a la del pool)
+            if frame.shape == slot.shape:
+                slot[...] = frame
+            else:
+                ret = False
+        
+        if not ret:
+            pool.release(idx)
+            return None
+        if self.recorder:
+            self.recorder.push(slot)
+        return idx
+
+    def attach_recorder(self, recorder):
+        """Conecta (o desconecta con None) un SegmentRecorder"""
+        if self.recorder and self.recorder is not recorder:
+            self.recorder.stop()
+        self.recorder = recorder
+        if recorder:
+            recorder.start()
+
+    def pause(self):
+        """Pausa la vista previa; con keep_open el dispositivo sigue abierto"""
+        if self.keep_open and self.cap:
+            self.paused = True
+        else:
+            self.stop()
+
     def stop(self):
         """Detiene la cámara"""
         if self.cap:
             self.cap.release()
             self.cap = None
         self.index = None
+        self.api = None
+        self.paused = False
 
     def get_camera_info(self):
         """Obtiene información de la cámara actual"""
@@ -155,7 +446,9 @@ class CameraService:
             "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
             "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
             "fps": int(self.cap.get(cv2.CAP_PROP_FPS)),
+            "fourcc": max(0, int(self.cap.get(cv2.CAP_PROP_FOURCC))).to_bytes(4, "little").decode(errors="replace"),
             "index": self.index,
+            "buffers": self.buffers.stats(),
             "system": self.system
         }
         return info
\ No newline at end of file
@@ -0,0 +1,322 @@
+import os
+import glob
+import time
+import queue
+import threading
+
+import cv2
+
+from storage_backends import IMAGE_EXTENSIONS
+
+# Tipos de fuente seleccionables desde config.json (camera.source.type)
+SOURCE_TYPES = ("auto", "v4l2", "gstreamer", "file", "folder")
+
+
+class _Pacer:
+    """Reproduce a la velocidad nativa (fps) o, sin realtime, lo más rápido posible"""
+
+    def __init__(self, fps, realtime=True):
+        self.period = 1.0 / fps if realtime and fps and fps > 0 else 0
+        self.next_time = None
+
+    def wait(self):
+        if not self.period:
+            return
+        now = time.monotonic()
+        # Tras una pausa se resincroniza en vez de soltar una ráfaga de frames
+        if self.next_time is None or now - self.next_time > self.period:
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time += self.period
+
+
+class VideoFileSource:
+    """Video grabado con la misma interfaz que cv2.VideoCapture.
+
+    read() respeta los fps del archivo si realtime=True; con loop=True vuelve
+    al inicio al terminar, si no marca finished y deja de entregar frames.
+    """
+
+    live = False
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.finished = False
+        self.cap = cv2.VideoCapture(path)
+        self.pacer = _Pacer(self.cap.get(cv2.CAP_PROP_FPS) or 30, realtime)
+
+    def read(self, image=None):
+        if self.finished:
+            return False, None
+        self.pacer.wait()
+        ret, frame = self._read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._read(image)
+        if not ret:
+            self.finished = True
+            print(f"⏹ Fin del video: {self.path}")
+        return ret, frame
+
+    def _read(self, image):
+        return self.cap.read(image) if image is not None else self.cap.read()
+
+    def grab(self):
+        return self.cap.grab()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        # Las propiedades de cámara no aplican a un archivo
+        return False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageFolderSource:
+    """Carpeta de imágenes (orden alfabético) reproducida como si fuera una cámara"""
+
+    live = False
+
+    def __init__(self, folder, fps=30, realtime=True, loop=False):
+        self.folder = folder
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.finished = False
+        self.files = sorted(
+            path for path in glob.glob(os.path.join(folder, "*"))
+            if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+        )
+        self.position = 0
+        self.shape = None
+        self.pacer = _Pacer(fps, realtime)
+
+    def _next_image(self):
+        """Siguiente imagen legible (se saltan las que no se pueden decodificar)"""
+        for _ in range(2 if self.loop else 1):
+            while self.position < len(self.files):
+                path = self.files[self.position]
+                self.position += 1
+                image = cv2.imread(path, cv2.IMREAD_COLOR)
+                if image is not None:
+                    self.shape = image.shape
+                    return image
+                print(f"⚠️ No se pudo leer {path}")
+            self.position = 0
+        return None
+
+    def read(self, image=None):
+        if self.finished:
+            return False, None
+        self.pacer.wait()
+        frame = self._next_image()
+        if frame is None:
+            self.finished = True
+            print(f"⏹ Fin de la carpeta: {self.folder}")
+            return False, None
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            # Mismo contrato que VideoCapture.read(buf): reutilizar el buffer
+            image[...] = frame
+            frame = image
+        return True, frame
+
+    def grab(self):
+        if self.position < len(self.files):
+            self.position += 1
+            return True
+        return False
+
+    def get(self, prop):
+        if self.shape is None and self.files:
+            first = cv2.imread(self.files[0], cv2.IMREAD_COLOR)
+            self.shape = first.shape if first is not None else None
+        height, width = self.shape[:2] if self.shape else (0, 0)
+        values = {
+            cv2.CAP_PROP_FRAME_WIDTH: width,
+            cv2.CAP_PROP_FRAME_HEIGHT: height,
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_COUNT: len(self.files),
+            cv2.CAP_PROP_POS_FRAMES: self.position
+        }
+        return values.get(prop, 0)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = max(0, min(int(value), len(self.files)))
+            self.finished = False
+            return True
+        return False
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def release(self):
+        self.files = []
+
+
+class ThreadedSource:
+    """Lee un video/carpeta (y espera sus fps) en un hilo propio.
+
+    Así la espera de _Pacer no bloquea la GUI y la velocidad nativa no queda
+    atada al ciclo de la vista previa. Con realtime solo se guarda el último
+    frame (read() lo repite hasta que llegue otro y la reproducción no se
+    atrasa si la vista previa es más lenta); sin realtime se entregan todos
+    los frames en orden y el hilo espera si la cola está llena.
+    """
+
+    live = False
+
+    def __init__(self, source, queue_size=4):
+        self.source = source
+        self.realtime = source.realtime
+        self.frames = queue.Queue(maxsize=1 if self.realtime else queue_size)
+        self.lock = threading.Lock()  # La fuente no se usa desde dos hilos a la vez
+        self.last = None
+        self.done = threading.Event()
+        self.running = False
+        self.thread = None
+        if source.isOpened():
+            self._start_thread()
+        else:
+            self.done.set()
+
+    def _start_thread(self):
+        self.running = True
+        self.done.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            with self.lock:
+                ret, frame = self.source.read()
+            if not ret:
+                break
+            if self.realtime:
+                # Solo interesa el último: se descarta el que nadie leyó
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+                self.frames.put(frame)
+            else:
+                while self.running:
+                    try:
+                        self.frames.put(frame, timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+        self.done.set()
+
+    def _next(self):
+        if self.realtime:
+            try:
+                # El primer frame se espera; después se repite el último si no hay otro
+                return self.frames.get(timeout=2) if self.last is None else self.frames.get_nowait()
+            except queue.Empty:
+                return None if self.done.is_set() else self.last
+        while True:
+            try:
+                return self.frames.get(timeout=0.1)
+            except queue.Empty:
+                if self.done.is_set() and self.frames.empty():
+                    return None
+
+    @property
+    def finished(self):
+        return self.done.is_set() and self.frames.empty() and self.source.finished
+
+    def read(self, image=None):
+        frame = self._next()
+        if frame is None:
+            return False, None
+        repeated = frame is self.last
+        self.last = frame
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            # Mismo contrato que VideoCapture.read(buf): reutilizar el buffer
+            image[...] = frame
+            frame = image
+        elif repeated:
+            frame = frame.copy()
+        return True, frame
+
+    def grab(self):
+        return self._next() is not None
+
+    def get(self, prop):
+        with self.lock:
+            return self.source.get(prop)
+
+    def set(self, prop, value):
+        with self.lock:
+            ok = self.source.set(prop, value)
+            if ok:
+                # Reposicionada: los frames encolados ya no corresponden
+                while not self.frames.empty():
+                    self.frames.get_nowait()
+                self.last = None
+        if ok and self.done.is_set():
+            self._start_thread()
+        return ok
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def release(self):
+        self.running = False
+        while not self.frames.empty():
+            self.frames.get_nowait()  # Destraba un put() en espera
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        with self.lock:
+            self.source.release()
+
+
+def list_sources(config):
+    """Identificadores a mostrar en la lista de cámaras para una fuente configurada"""
+    source_type = config.get("type", "auto")
+    if source_type == "v4l2":
+        if config.get("device") is not None:
+            return [config["device"]]
+        devices = []
+        for path in sorted(glob.glob("/dev/video*")):
+            cap = cv2.VideoCapture(path, cv2.CAP_V4L2)
+            if cap.isOpened():
+                devices.append(path)
+            cap.release()
+        return devices
+    if source_type == "gstreamer":
+        return [config.get("pipeline")] if config.get("pipeline") else []
+    if source_type in ("file", "folder"):
+        path = config.get("path")
+        return [path] if path and os.path.exists(path) else []
+    return []
+
+
+def open_source(config, camera_id):
+    """Abre la fuente configurada; retorna un objeto con interfaz de VideoCapture"""
+    source_type = config.get("type", "auto")
+    if source_type == "v4l2":
+        return cv2.VideoCapture(camera_id, cv2.CAP_V4L2)
+    if source_type == "gstreamer":
+        # ej. decodificación JPEG por hardware en la Pi:
+        # v4l2src ! image/jpeg,width=1920,height=1080 ! v4l2jpegdec ! videoconvert ! appsink drop=1
+        return cv2.VideoCapture(camera_id, cv2.CAP_GSTREAMER)
+    if source_type == "file":
+        return ThreadedSource(VideoFileSource(camera_id, config.get("realtime", True),
+                                              config.get("loop", False)))
+    if source_type == "folder":
+        return ThreadedSource(ImageFolderSource(camera_id, config.get("fps", 30),
+                                                config.get("realtime", True),
+                                                config.get("loop", False)))
+    raise ValueError(f"Tipo de fuente desconocido: {source_type}")
@@ -0,0 +1,172 @@
+import time
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+
+def _parse_result(result):
+    """Extrae (texto, puntos) de detectAndDecode, sea cual sea la versión de OpenCV.
+
+    QR y barcode (>= 4.8): (texto, puntos, straight)
+    barcode contrib antiguo: (ok, [textos], [tipos], puntos)
+    """
+    text, points = None, None
+    for item in result:
+        if isinstance(item, str):
+            text = text or item or None
+        elif isinstance(item, (list, tuple)) and item and isinstance(item[0], str):
+            if text is None:
+                text = next((t for t in item if t), None)
+        elif isinstance(item, np.ndarray) and points is None and item.size >= 8:
+            points = item.reshape(-1, 2)[:4]
+    return text, points
+
+
+class CodeReader:
+    """Lectura de QR/códigos de barras en un hilo de trabajo.
+
+    submit() se llama desde la vista previa y es casi gratis: si el hilo está
+    ocupado o no pasó el intervalo mínimo, el frame se ignora. El hilo busca
+    primero en la región donde se leyó el último código (más rápido) y, si no
+    lo encuentra, en todo el frame reducido. Un código se reporta cuando se
+    lee igual en stable_frames lecturas seguidas. El mismo código no se vuelve
+    a reportar hasta que falle rearm_misses lecturas seguidas (la etiqueta se
+    retiró): una lectura fallida suelta no provoca otra captura.
+    """
+
+    def __init__(self, width=640, max_rate=4, stable_frames=3, barcodes=True, margin=0.5,
+                 rearm_misses=8):
+        self.width = width
+        self.interval = 1.0 / max_rate if max_rate else 0
+        self.stable_frames = stable_frames
+        self.rearm_misses = rearm_misses
+        self.margin = margin
+
+        self.qr = cv2.QRCodeDetector()
+        self.barcode = None
+        if barcodes:
+            # Disponible en OpenCV >= 4.8 (o en opencv-contrib para versiones anteriores)
+            factory = getattr(getattr(cv2, "barcode", None), "BarcodeDetector", None) or \
+                getattr(cv2, "barcode_BarcodeDetector", None)
+            if factory:
+                self.barcode = factory()
+
+        self.last_region = None  # (x0, y0, x1, y1) en coords. del frame reducido
+        self.candidate = None
+        self.count = 0
+        self.reported = None
+        self.misses = 0  # Lecturas fallidas seguidas
+
+        self.results = queue.Queue()
+        self.pending = None
+        self.pending_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.busy = False
+        self.last_submit = 0
+
+        self.running = False
+        self.thread = None
+
+    # --- Lado de la vista previa ---
+    def submit(self, frame):
+        now = time.monotonic()
+        if not self.running or self.busy or now - self.last_submit < self.interval:
+            return
+        self.last_submit = now
+        step = max(1, frame.shape[1] // self.width)
+        with self.pending_lock:
+            # Copia solo de la versión reducida (el frame original se reutiliza)
+            self.pending = np.ascontiguousarray(frame[::step, ::step])
+        self.wakeup.set()
+
+    def poll(self):
+        """Código estable leído desde la última consulta, o None"""
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    # --- Hilo de trabajo ---
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def _run(self):
+        while self.running:
+            self.wakeup.wait(timeout=0.5)
+            self.wakeup.clear()
+            with self.pending_lock:
+                image, self.pending = self.pending, None
+            if image is None:
+                continue
+            self.busy = True
+            try:
+                self._handle(self.decode(image))
+            except cv2.error as e:
+                print(f"⚠️ Error al decodificar código: {e}")
+            finally:
+                self.busy = False
+
+    def decode(self, image):
+        """Busca un código, primero en la última región conocida"""
+        if self.last_region:
+            x0, y0, x1, y1 = self.last_region
+            text = self._decode_in(image[y0:y1, x0:x1], (x0, y0), image.shape)
+            if text:
+                return text
+        return self._decode_in(image, (0, 0), image.shape)
+
+    def _decode_in(self, region, offset, shape):
+        if region.size == 0:
+            return None
+        detectors = [self.qr] + ([self.barcode] if self.barcode else [])
+        for detector in detectors:
+            text, points = _parse_result(detector.detectAndDecode(region))
+            if text:
+                self._remember_region(points, offset, shape)
+                return text
+        return None
+
+    def _remember_region(self, points, offset, shape):
+        """Guarda la zona del código (con margen) para la próxima búsqueda"""
+        if points is None:
+            self.last_region = None
+            return
+        xs = points[:, 0] + offset[0]
+        ys = points[:, 1] + offset[1]
+        pad_x = (xs.max() - xs.min()) * self.margin
+        pad_y = (ys.max() - ys.min()) * self.margin
+        height, width = shape[:2]
+        self.last_region = (
+            int(max(0, xs.min() - pad_x)), int(max(0, ys.min() - pad_y)),
+            int(min(width, xs.max() + pad_x)), int(min(height, ys.max() + pad_y))
+        )
+
+    def _handle(self, text):
+        if not text:
+            self.last_region = None
+            self.candidate, self.count = None, 0
+            self.misses += 1
+            if self.misses >= self.rearm_misses:
+                self.reported = None  # Se retiró la etiqueta: puede volver a leerse
+            return
+        self.misses = 0
+        if text == self.candidate:
+            self.count += 1
+        else:
+            self.candidate, self.count = text, 1
+        if self.count >= self.stable_frames and text != self.reported:
+            self.reported = text
+            self.results.put(text)
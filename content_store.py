@@ -0,0 +1,260 @@
+import os
+import time
+import socket
+import hashlib
+import argparse
+import threading
+
+# Tamaño del digest BLAKE2b (20 bytes = 40 caracteres hex, suficiente sin colisiones)
+DIGEST_SIZE = 20
+MANIFESTS_DIR = "manifests"
+OBJECTS_DIR = "objects"
+
+
+def blake2_digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def object_key(digest, ext=""):
+    """Clave del objeto: objects/ab/abcdef...png (dos niveles para no llenar una carpeta)"""
+    return f"{OBJECTS_DIR}/{digest[:2]}/{digest}{ext}"
+
+
+def _read_lines(path):
+    """Entradas del manifiesto en orden, ignorando una última línea incompleta"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # Escritura interrumpida: se ignora
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 5:
+                continue
+            digest, size, timestamp, key, name = parts
+            yield {
+                "digest": digest,
+                "size": int(size),
+                "timestamp": float(timestamp),
+                "key": key,
+                "name": name
+            }
+
+
+def read_manifest(path):
+    """Lee un manifiesto: {(digest, nombre): entrada}.
+
+    Un mismo contenido puede figurar con varios nombres de captura; cada
+    nombre es una entrada propia.
+    """
+    return {(entry["digest"], entry["name"]): entry for entry in _read_lines(path)}
+
+
+def _trim_partial_line(path):
+    """Descarta una línea incompleta al final (escritura cortada por un apagón)"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Buscar hacia atrás el último salto de línea (las líneas son cortas)
+        start = max(0, size - 4096)
+        f.seek(start)
+        tail = f.read()
+        cut = tail.rfind(b"\n")
+        f.truncate(start + cut + 1 if cut >= 0 else 0)
+
+
+def _append_manifest(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _trim_partial_line(path)
+    line ="\t".join([entry["digest"], str(entry["size"]), f"{entry['timestamp']:.3f}",
+                      entry["key"], entry["name"].replace("\t", " ")]) + "\n"
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class ContentStore:
+    """Almacén direccionado por contenido (BLAKE2b) con manifiesto por estación.
+
+    Los objetos se guardan a través del backend bajo objects/<hash>; el
+    manifiesto (manifests/<estación>.tsv) es local, de solo anexado, con una
+    línea por captura: hash, tamaño, fecha, clave y nombre original.
+
+    El nombre original es el nombre lógico de la captura (metadatos y
+    etiquetas usan ese nombre, no el hash): lookup() lo traduce al objeto y
+    name_of() hace lo inverso.
+    """
+
+    def __init__(self, backend, root, station_id=None):
+        self.backend = backend
+        self.root = root
+        self.station_id = station_id or socket.gethostname()
+        self.manifest_path = os.path.join(root, MANIFESTS_DIR, f"{self.station_id}.tsv")
+        self.lock = threading.Lock()
+        self._names = None    # nombre -> entrada (carga perezosa)
+        self._digests = None  # digest -> nombre
+
+    def relocate(self, backend, root):
+        self.backend = backend
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFESTS_DIR, f"{self.station_id}.tsv")
+        with self.lock:
+            self._names = self._digests = None
+
+    def entries(self):
+        return read_manifest(self.manifest_path)
+
+    def _load(self):
+        """Índices nombre <-> digest del manifiesto (llamar con el lock tomado)"""
+        if self._names is None:
+            self._names, self._digests = {}, {}
+            for entry in _read_lines(self.manifest_path):
+                self._names[entry["name"]] = entry
+                self._digests[entry["digest"]] = entry["name"]
+
+    def names(self):
+        """{nombre original: entrada} de todas las capturas registradas"""
+        with self.lock:
+            self._load()
+            return dict(self._names)
+
+    def lookup(self, name):
+        """Entrada de la captura con ese nombre original, o None"""
+        with self.lock:
+            self._load()
+            return self._names.get(name)
+
+    def name_of(self, digest):
+        """Nombre original (el último registrado) de un digest, o None"""
+        with self.lock:
+            self._load()
+            return self._digests.get(digest)
+
+    def put(self, data, name, content_type=None):
+        """Guarda bytes por contenido; retorna (ruta, digest)"""
+        digest = blake2_digest(data)
+        key = object_key(digest, os.path.splitext(name)[1].lower())
+
+        # Contenido repetido: no se vuelve a escribir el objeto. Se decide con
+        # el manifiesto y la copia local, sin consultar la red (una captura no
+        # debe fallar ni esperar si el servidor no responde: para eso está el outbox)
+        location = self.backend.local_path(key)
+        if location is None:
+            with self.lock:
+                self._load()
+                stored = digest in self._digests
+            location = self.backend.uri(key) if stored else \
+                self.backend.put(key, data, content_type)
+
+        with self.lock:
+            self._load()
+            # Se registra cada nombre aunque el contenido ya exista
+            known = self._names.get(name)
+            if not known or known["digest"] != digest:
+                entry = {"digest": digest, "size": len(data), "timestamp": time.time(),
+                         "key": key, "name": name}
+                _append_manifest(self.manifest_path, entry)
+                self._names[name] = entry
+                self._digests[digest] = name
+        return location, digest
+
+
+def manifest_delta(source, destination):
+    """Entradas (digest, nombre) de source (dict de read_manifest) que faltan en destination"""
+    return [entry for line, entry in source.items() if line not in destination]
+
+
+def _copy_verified(src_path, dst_path, digest, chunk_size=1024 * 1024):
+    """Copia con verificación del hash; escritura atómica (.part + rename)"""
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + ".part"
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    if hasher.hexdigest() != digest:
+        os.remove(tmp_path)
+        raise ValueError(f"Hash no coincide: {src_path}")
+    os.replace(tmp_path, dst_path)
+
+
+def sync(source_root, destination_root, stations=None):
+    """Copia a destination_root solo los objetos que le faltan.
+
+    Cada manifiesto de estación en source_root se compara con el del mismo
+    nombre en el destino, línea por línea (digest y nombre): los objetos se
+    copian una vez por digest pero se anexan todos los nombres. Una entrada se anexa al manifiesto destino solo
+    después de copiar (y verificar) su objeto, así que si la sincronización
+    se interrumpe basta con volver a ejecutarla.
+    """
+    manifests_dir = os.path.join(source_root, MANIFESTS_DIR)
+    names = sorted(f for f in os.listdir(manifests_dir) if f.endswith(".tsv")) \
+        if os.path.isdir(manifests_dir) else []
+    if stations:
+        names = [n for n in names if os.path.splitext(n)[0] in stations]
+
+    report = {"stations": len(names), "copied": 0, "bytes": 0, "skipped": 0, "errors": 0}
+    for name in names:
+        dst_manifest = os.path.join(destination_root, MANIFESTS_DIR, name)
+        delta = manifest_delta(read_manifest(os.path.join(manifests_dir, name)),
+                               read_manifest(dst_manifest))
+
+        for entry in delta:
+            parts = entry["key"].split("/")
+            src_path = os.path.join(source_root, *parts)
+            dst_path = os.path.join(destination_root, *parts)
+            try:
+                if os.path.exists(dst_path):
+                    # Otra estación ya trajo el mismo contenido
+                    report["skipped"] += 1
+                else:
+                    _copy_verified(src_path, dst_path, entry["digest"])
+                    report["copied"] += 1
+                    report["bytes"] += entry["size"]
+                _append_manifest(dst_manifest, entry)
+            except (OSError, ValueError) as e:
+                print(f"❌ {entry['name']}: {e}")
+                report["errors"] += 1
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincronización incremental de capturas")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_sync = sub.add_parser("sync", help="Copiar objetos faltantes al destino")
+    p_sync.add_argument("source", help="Carpeta de capturas de la estación")
+    p_sync.add_argument("destination", help="Carpeta destino (local o recurso compartido montado)")
+    p_sync.add_argument("--station", action="append", help="Limitar a estas estaciones")
+
+    p_diff = sub.add_parser("diff", help="Mostrar qué falta en el segundo manifiesto")
+    p_diff.add_argument("source_manifest")
+    p_diff.add_argument("destination_manifest")
+
+    args = parser.parse_args()
+    if args.command == "sync":
+        result = sync(args.source, args.destination, args.station)
+        print(f"✅ Estaciones: {result['stations']} | Copiados: {result['copied']} "
+              f"({result['bytes'] / 1e6:.1f} MB) | Ya presentes: {result['skipped']} | "
+              f"Errores: {result['errors']}")
+    else:
+        missing = manifest_delta(read_manifest(args.source_manifest),
+                                 read_manifest(args.destination_manifest))
+        for entry in missing:
+            print(f"{entry['digest']}\t{entry['size']}\t{entry['name']}")
+        objects = {e["digest"]: e["size"] for e in missing}
+        print(f"Faltan {len(missing)} capturas en {len(objects)} objetos "
+              f"({sum(objects.values()) / 1e6:.1f} MB)")
@@ -0,0 +1,389 @@
+import os
+import json
+import argparse
+
+import numpy as np
+
+from storage_backends import IMAGE_EXTENSIONS
+
+
+# --- Conversión de cajas (vectorizada, arrays de forma (N, 4)) ---
+def xyxy_to_xywh(boxes):
+    """Absoluto x_min,y_min,x_max,y_max -> COCO x,y,ancho,alto"""
+    out = boxes.astype(np.float64, copy=True)
+    out[:, 2:] -= boxes[:, :2]
+    return out
+
+
+def xywh_to_xyxy(boxes):
+    """COCO x,y,ancho,alto -> absoluto x_min,y_min,x_max,y_max"""
+    out = boxes.astype(np.float64, copy=True)
+    out[:, 2:] += boxes[:, :2]
+    return out
+
+
+def xyxy_to_cxcywh(boxes, widths, heights):
+    """Absoluto xyxy -> YOLO cx,cy,w,h normalizado (widths/heights por caja)"""
+    out = np.empty(boxes.shape, dtype=np.float64)
+    out[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2 / widths
+    out[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2 / heights
+    out[:, 2] = (boxes[:, 2] - boxes[:, 0]) / widths
+    out[:, 3] = (boxes[:, 3] - boxes[:, 1]) / heights
+    return out
+
+
+def cxcywh_to_xyxy(boxes, widths, heights):
+    """YOLO cx,cy,w,h normalizado -> absoluto xyxy"""
+    half_w = boxes[:, 2] * widths / 2
+    half_h = boxes[:, 3] * heights / 2
+    cx = boxes[:, 0] * widths
+    cy = boxes[:, 1] * heights
+    return np.column_stack([cx - half_w, cy - half_h, cx + half_w, cy + half_h])
+
+
+class LabelSet:
+    """Conjunto de etiquetas en memoria: una fila por caja, en xyxy absoluto"""
+
+    def __init__(self, images, image_index, class_ids, boxes, categories=None):
+        self.images = images                  # [{"id", "file_name", "width", "height"}]
+        self.image_index = np.asarray(image_index, dtype=np.int64)  # fila -> posición en images
+        self.class_ids = np.asarray(class_ids, dtype=np.int64)
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.categories = categories or {}    # id -> nombre
+        self.issues = {}                      # problemas encontrados al cargar
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def image_sizes(self):
+        """Ancho y alto de la imagen de cada caja (arrays (N,))"""
+        sizes = np.array([(img["width"], img["height"]) for img in self.images],
+                         dtype=np.float64).reshape(-1, 2)
+        per_box = sizes[self.image_index]
+        return per_box[:, 0], per_box[:, 1]
+
+    def validate(self, clip=True):
+        """Detecta cajas fuera de la imagen o degeneradas.
+
+        Con clip=True se recortan al borde y se descartan las que quedan vacías.
+        Retorna un resumen con los conteos.
+        """
+        widths, heights = self.image_sizes()
+        b = self.boxes
+        out_of_range = ((b[:, 0] < 0) | (b[:, 1] < 0) |
+                        (b[:, 2] > widths) | (b[:, 3] > heights))
+        report = {"boxes": len(self), "out_of_range": int(out_of_range.sum())}
+
+        if clip:
+            b[:, 0] = np.clip(b[:, 0], 0, widths)
+            b[:, 2] = np.clip(b[:, 2], 0, widths)
+            b[:, 1] = np.clip(b[:, 1], 0, heights)
+            b[:, 3] = np.clip(b[:, 3], 0, heights)
+
+        degenerate = (b[:, 2] <= b[:, 0]) | (b[:, 3] <= b[:, 1])
+        report["degenerate"] = int(degenerate.sum())
+        if clip and degenerate.any():
+            keep = ~degenerate
+            self.image_index = self.image_index[keep]
+            self.class_ids = self.class_ids[keep]
+            self.boxes = self.boxes[keep]
+        report["kept"] = len(self)
+        return report
+
+    def by_image(self):
+        """Itera (posición de imagen, filas) agrupando las cajas por imagen"""
+        order = np.argsort(self.image_index, kind="stable")
+        sorted_index = self.image_index[order]
+        bounds = np.searchsorted(sorted_index, np.arange(len(self.images) + 1))
+        for pos in range(len(self.images)):
+            yield pos, order[bounds[pos]:bounds[pos + 1]]
+
+
+# --- Carga ---
+def _image_size(path):
+    """Ancho y alto leyendo solo la cabecera de la imagen"""
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+def read_yolo_rows(path):
+    """Filas (N, 5) class,cx,cy,w,h de un .txt YOLO y cantidad de líneas inválidas.
+
+    Los polígonos de segmentación se convierten a su caja envolvente (cantidad
+    como segundo valor). También lo usa dataset_stats.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    values = text.split()
+    if not values:
+        return np.empty((0, 5)), 0, 0
+
+    if len(values) % 5 == 0:
+        # Caso común: todas las líneas son "class cx cy w h"
+        try:
+            rows = np.array(values, dtype=np.float64).reshape(-1, 5)
+            if rows.shape[0] == text.count("\n") + (not text.endswith("\n")):
+                return rows, 0, 0
+        except ValueError:
+            pass
+
+    rows, polygons, bad = [], 0, 0
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            if len(parts) == 5:
+                rows.append([float(v) for v in parts])
+            elif len(parts) > 5 and len(parts) % 2 == 1:
+                coords = np.array(parts[1:], dtype=np.float64).reshape(-1, 2)
+                (x0, y0), (x1, y1) = coords.min(axis=0), coords.max(axis=0)
+                rows.append([float(parts[0]), (x0 + x1) / 2, (y0 + y1) / 2, x1 - x0, y1 - y0])
+                polygons += 1
+            else:
+                bad += 1
+        except ValueError:
+            bad += 1
+    return np.array(rows, dtype=np.float64).reshape(-1, 5), polygons, bad
+
+
+def load_yolo(labels_dir, images_dir, default_size=None, categories=None,
+              image_paths=None, image_sizes=None):
+    """Carga todas las etiquetas YOLO (.txt) de una carpeta.
+
+    image_paths ({nombre base: ruta}) agrega imágenes fuera de images_dir
+    (capturas guardadas por contenido) e image_sizes ({nombre base: (w, h)})
+    fija el tamaño de las etiquetas en coordenadas del frame completo.
+    """
+    # Índice de imágenes por nombre base (para leer su tamaño)
+    image_paths = dict(image_paths or {})
+    image_sizes = image_sizes or {}
+    if images_dir and os.path.isdir(images_dir):
+        for dirpath, _, filenames in os.walk(images_dir):
+            for name in filenames:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    image_paths.setdefault(os.path.splitext(name)[0], os.path.join(dirpath, name))
+
+    images, chunks, skipped = [], [], 0
+    polygons, bad_lines, bad_files = 0, 0, []
+    for dirpath, _, filenames in os.walk(labels_dir):
+        for name in sorted(filenames):
+            if not name.endswith(".txt") or name == "classes.txt":
+                continue
+            stem = os.path.splitext(name)[0]
+            image_path = image_paths.get(stem)
+            size = image_sizes.get(stem) or default_size
+            if image_path and stem not in image_sizes:
+                try:
+                    size = _image_size(image_path)
+                except Exception as e:
+                    print(f"⚠️ No se pudo leer {image_path}: {e}")
+            if not size:
+                skipped += 1
+                continue
+            width, height = size
+
+            path = os.path.join(dirpath, name)
+            try:
+                rows, file_polygons, file_bad = read_yolo_rows(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"⚠️ No se pudo leer {path}: {e}")
+                bad_files.append(path)
+                continue
+            polygons += file_polygons
+            bad_lines += file_bad
+            if file_bad:
+                bad_files.append(path)
+
+            pos = len(images)
+            images.append({
+                "id": pos + 1,
+                # Nombre original (la ruta puede ser un objeto objects/ab/<hash>.png)
+                "file_name": stem + (os.path.splitext(image_path)[1] if image_path else ".png"),
+                "width": int(width),
+                "height": int(height)
+            })
+            chunks.append(np.column_stack([np.full(len(rows), pos), rows]))
+
+    if skipped:
+        print(f"⚠️ {skipped} archivos de etiquetas sin imagen (usa default_size)")
+    if polygons:
+        print(f"ℹ️ {polygons} polígonos de segmentación convertidos a caja envolvente")
+    if bad_files:
+        print(f"⚠️ {len(bad_files)} archivos con líneas inválidas ({bad_lines} líneas omitidas), "
+              f"por ejemplo {bad_files[0]}")
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, 6))
+    labels = LabelSet(images, data[:, 0], data[:, 1], np.empty((len(data), 4)), categories)
+    widths, heights = labels.image_sizes()
+    labels.boxes = cxcywh_to_xyxy(data[:, 2:6], widths, heights)
+
+    # Clases usadas que no tienen nombre: se nombran con su índice
+    labels.categories = dict(labels.categories)
+    for c in np.unique(labels.class_ids).tolist():
+        labels.categories.setdefault(int(c), str(int(c)))
+    labels.issues = {"polygons": polygons, "invalid_lines": bad_lines,
+                     "invalid_files": len(bad_files)}
+    return labels
+
+
+def load_coco(json_path):
+    """Carga un JSON COCO completo"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    images = [{"id": img["id"], "file_name": img.get("file_name", ""),
+               "width": img.get("width", 0), "height": img.get("height", 0)}
+              for img in data.get("images", [])]
+    position = {img["id"]: pos for pos, img in enumerate(images)}
+
+    annotations = [a for a in data.get("annotations", []) if a.get("image_id") in position]
+    image_index = np.array([position[a["image_id"]] for a in annotations], dtype=np.int64)
+    class_ids = np.array([a.get("category_id", 0) for a in annotations], dtype=np.int64)
+    bbox = np.array([a.get("bbox", [0, 0, 0, 0])[:4] for a in annotations],
+                    dtype=np.float64).reshape(-1, 4)
+
+    categories = {c["id"]: c.get("name", str(c["id"])) for c in data.get("categories", [])}
+    return LabelSet(images, image_index, class_ids, xywh_to_xyxy(bbox), categories)
+
+
+# --- Escritura en streaming (sin armar todo el resultado en memoria) ---
+def write_yolo(labels, labels_dir, class_map=None):
+    """Escribe un .txt por imagen; class_map convierte id de categoría -> clase YOLO.
+
+    Las cajas cuya categoría no está en class_map se omiten y se reportan.
+    """
+    os.makedirs(labels_dir, exist_ok=True)
+    widths, heights = labels.image_sizes()
+    norm = xyxy_to_cxcywh(labels.boxes, widths, heights)
+    classes = labels.class_ids
+    if class_map:
+        classes = np.array([class_map.get(int(c), -1) for c in classes], dtype=np.int64)
+        unknown = classes < 0
+        if unknown.any():
+            missing = sorted(set(labels.class_ids[unknown].tolist()))
+            print(f"⚠️ {int(unknown.sum())} cajas con categorías sin clase YOLO {missing}: omitidas")
+
+    written = 0
+    for pos, rows in labels.by_image():
+        rows = rows[classes[rows] >= 0]
+        image = labels.images[pos]
+        stem = os.path.splitext(image["file_name"])[0]
+        lines = [f"{c} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n"
+                 for c, (x, y, w, h) in zip(classes[rows].tolist(), norm[rows].tolist())]
+        with open(os.path.join(labels_dir, f"{stem}.txt"), 'w') as f:
+            f.writelines(lines)
+        written += 1
+    return written
+
+
+def write_coco(labels, json_path, description="Dataset de inspección automática"):
+    """Escribe un JSON COCO elemento por elemento"""
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    xywh = xyxy_to_xywh(labels.boxes)
+    areas = xywh[:, 2] * xywh[:, 3]
+
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"info": ' + json.dumps({"description": description, "version": "1.0"}))
+        f.write(', "licenses": [], "categories": ')
+        f.write(json.dumps([{"id": int(cid), "name": name}
+                            for cid, name in sorted(labels.categories.items())]))
+
+        f.write(', "images": [')
+        for i, image in enumerate(labels.images):
+            f.write((", " if i else "") + json.dumps(image))
+
+        f.write('], "annotations": [')
+        image_ids = [img["id"] for img in labels.images]
+        rows = zip(labels.image_index.tolist(), labels.class_ids.tolist(),
+                   xywh.round(2).tolist(), areas.round(2).tolist())
+        for i, (pos, cid, bbox, area) in enumerate(rows):
+            f.write((", " if i else "") + json.dumps({
+                "id": i + 1, "image_id": image_ids[pos], "category_id": cid,
+                "bbox": bbox, "area": area, "iscrowd": 0
+            }))
+        f.write("]}\n")
+    os.replace(tmp_path, json_path)
+    return json_path
+
+
+class DatasetConverter:
+    """Conversión masiva YOLO <-> COCO sobre la estructura de StorageManager"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def yolo_to_coco(self, labels_dir=None, images_dir=None, output=None,
+                     classes=None, default_size=None, clip=True):
+        """Convierte las etiquetas YOLO a un único JSON COCO.
+
+        Sin classes, los nombres salen de dataset.yaml (exports/yolo) o de las
+        clases por defecto de StorageManager.
+        """
+        from dataset_stats import load_class_names
+
+        classes = classes or load_class_names(self.storage.get_path("yolo")) or \
+            dict(self.storage.DEFAULT_CLASSES)
+        labels_dir = labels_dir or os.path.join(self.storage.get_path("yolo"), "labels")
+        images_dir = images_dir or self.storage.get_path("images")
+        output = output or os.path.join(self.storage.get_path("coco"), "dataset.json")
+
+        labels = load_yolo(labels_dir, images_dir, default_size, classes,
+                           image_paths=self.storage.content_image_paths(),
+                           image_sizes=self.storage.frame_sizes())
+        report = labels.validate(clip=clip)
+        write_coco(labels, output)
+        report.update(labels.issues)
+        report.update({"images": len(labels.images), "output": output})
+        return report
+
+    def coco_to_yolo(self, coco_path, output_dir=None, clip=True):
+        """Convierte un JSON COCO a etiquetas YOLO y genera dataset.yaml"""
+        output_dir = output_dir or os.path.join(self.storage.get_path("yolo"), "labels")
+
+        labels = load_coco(coco_path)
+        report = labels.validate(clip=clip)
+
+        # YOLO necesita clases 0..n-1; COCO suele numerar desde 1. Se incluyen
+        # también los category_id usados que no figuran en "categories"
+        ids = sorted(set(labels.categories) | set(labels.class_ids.tolist()))
+        class_map = {cid: i for i, cid in enumerate(ids)}
+        classes = {i: labels.categories.get(cid, str(cid)) for cid, i in class_map.items()}
+
+        written = write_yolo(labels, output_dir, class_map)
+        self.storage.export_for_training("yolo", classes)
+        report.update({"images": written, "classes": classes, "output": output_dir})
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversión masiva de etiquetas YOLO <-> COCO")
+    parser.add_argument("direction", choices=["yolo2coco", "coco2yolo"])
+    parser.add_argument("--folder", help="Carpeta base del dataset (por defecto ./capturas)")
+    parser.add_argument("--input", help="Carpeta de etiquetas YOLO o archivo JSON COCO")
+    parser.add_argument("--images", help="Carpeta de imágenes (para tamaños en yolo2coco)")
+    parser.add_argument("--output", help="Archivo/carpeta de salida")
+    parser.add_argument("--size", nargs=2, type=int, metavar=("W", "H"),
+                        help="Tamaño por defecto si no se encuentra la imagen")
+    parser.add_argument("--classes", nargs="+", metavar="NOMBRE",
+                        help="Nombres de clase en orden de índice YOLO (yolo2coco; "
+                             "por defecto dataset.yaml)")
+    parser.add_argument("--no-clip", action="store_true",
+                        help="No recortar cajas fuera de la imagen (solo reportar)")
+    args = parser.parse_args()
+
+    from storage_manager import StorageManager
+    converter = DatasetConverter(StorageManager(args.folder))
+
+    if args.direction == "yolo2coco":
+        classes = dict(enumerate(args.classes)) if args.classes else None
+        result = converter.yolo_to_coco(args.input, args.images, args.output, classes=classes,
+                                        default_size=args.size, clip=not args.no_clip)
+    else:
+        if not args.input:
+            parser.error("coco2yolo requiere --input con el JSON COCO")
+        result = converter.coco_to_yolo(args.input, args.output, clip=not args.no_clip)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,288 @@
+import os
+import ast
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset_converter import read_yolo_rows
+
+# Archivo de caché (dentro de la carpeta del dataset)
+CACHE_FILENAME = ".stats_cache.npz"
+
+# Histogramas con bins fijos para que sean comparables entre corridas
+SIZE_BINS = np.linspace(0.0, 1.0, 21)     # sqrt(w*h) normalizado
+ASPECT_BINS = np.linspace(-3.0, 3.0, 25)  # log2(ancho/alto)
+
+# Por debajo de esta cantidad de archivos no vale la pena levantar procesos
+MIN_FILES_FOR_POOL = 256
+
+
+def _empty():
+    return (np.empty((0, 2), dtype=np.float32), np.empty(0, dtype=str), np.empty(0, dtype=str))
+
+
+def _parse_yolo(path):
+    """Lee un .txt YOLO; retorna (tamaños (N, 2), clases (N,), imágenes (N,)).
+
+    Tamaños normalizados (ancho, alto); la clase es el índice YOLO como texto
+    y la imagen es el nombre base del archivo.
+    """
+    rows, _, _ = read_yolo_rows(path)
+    if not len(rows):
+        return _empty()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return (rows[:, 3:5].astype(np.float32), rows[:, 0].astype(np.int64).astype(str),
+            np.full(len(rows), stem))
+
+
+def _parse_coco(path):
+    """Lee un JSON COCO; retorna (tamaños (N, 2), clases (N,), imágenes (N,)).
+
+    La clase es el nombre de la categoría (o "coco:<id>" si no tiene), para
+    no mezclar category_id con los índices YOLO.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    images = {img["id"]: img for img in data.get("images", [])}
+    annotations = [a for a in data.get("annotations") or [] if a.get("image_id") in images]
+    if not annotations:
+        return _empty()
+
+    names = {c["id"]: c.get("name") for c in data.get("categories", [])}
+    labels = np.array([names.get(a.get("category_id")) or f"coco:{a.get('category_id', 0)}"
+                       for a in annotations], dtype=str)
+    stems = np.array([os.path.splitext(images[a["image_id"]].get("file_name", ""))[0]
+                      for a in annotations], dtype=str)
+    bbox = np.array([a.get("bbox", [0, 0, 0, 0])[:4] for a in annotations], dtype=np.float32)
+    dims = np.array([(images[a["image_id"]].get("width") or 1,
+                      images[a["image_id"]].get("height") or 1)
+                     for a in annotations], dtype=np.float32)
+    return bbox[:, 2:4] / dims, labels, stems
+
+
+def _parse_batch(paths):
+    """Trabajo de un proceso: parsea varios archivos de etiquetas"""
+    results = []
+    for path in paths:
+        try:
+            if path.endswith(".json"):
+                results.append(_parse_coco(path))
+            else:
+                results.append(_parse_yolo(path))
+        except Exception as e:
+            print(f"⚠️ No se pudo leer {path}: {e}")
+            results.append(_empty())
+    return results
+
+
+def load_class_names(folder):
+    """Nombres de clase YOLO de dataset.yaml ("names: {0: 'a'}" o "names: ['a']")"""
+    path = os.path.join(folder, "dataset.yaml")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("names:"):
+                    names = ast.literal_eval(line.split(":", 1)[1].strip())
+                    if isinstance(names, (list, tuple)):
+                        names = dict(enumerate(names))
+                    return {int(k): str(v) for k, v in names.items()}
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"⚠️ No se pudieron leer las clases de {path}: {e}")
+    return {}
+
+
+def _serial_from_filename(filename):
+    """"{serial}_{YYYYmmdd}_{HHMMSS[mmm]}.png" -> serial"""
+    stem = os.path.splitext(filename)[0]
+    parts = stem.rsplit("_", 2)
+    return parts[0] if len(parts) == 3 else stem
+
+
+class DatasetScanner:
+    """Estadísticas del dataset (YOLO + COCO) en paralelo con caché por mtime.
+
+    Cada imagen cuenta una sola vez: si tiene etiqueta YOLO se usa esa y las
+    anotaciones COCO solo cuentan para imágenes sin .txt (y del primer JSON
+    que las incluya). Las clases se agregan por nombre: los índices YOLO se
+    traducen con class_names (o dataset.yaml) y COCO usa sus categorías.
+    """
+
+    def __init__(self, root, label_dirs, image_files=None, workers=None, class_names=None):
+        self.root = root
+        self.label_dirs = label_dirs
+        self.image_files = image_files or []
+        self.class_names = class_names
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_path = os.path.join(root, CACHE_FILENAME)
+
+    def _find_label_files(self):
+        files = []
+        for folder in self.label_dirs:
+            for dirpath, _, filenames in sorted(os.walk(folder)):
+                # Orden fijo: define qué JSON COCO manda si varios cubren la misma imagen
+                for name in sorted(filenames):
+                    if name.endswith(".txt") and name != "classes.txt":
+                        files.append(os.path.join(dirpath, name))
+                    elif name.endswith(".json"):
+                        files.append(os.path.join(dirpath, name))
+        return files
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cache:
+                paths = cache["paths"]
+                stamps = cache["stamps"]
+                offsets = cache["offsets"]
+                sizes, labels, stems = cache["sizes"], cache["labels"], cache["stems"]
+            return {
+                str(path): (tuple(stamps[i]), tuple(
+                    column[offsets[i]:offsets[i + 1]] for column in (sizes, labels, stems)))
+                for i, path in enumerate(paths)
+            }
+        except Exception as e:
+            print(f"⚠️ Caché de estadísticas inválida, se reconstruye: {e}")
+            return {}
+
+    def _save_cache(self, paths, stamps, arrays):
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        if arrays:
+            offsets[1:] = np.cumsum([len(a[0]) for a in arrays])
+        sizes, labels, stems = _concat(arrays)
+
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, paths=np.array(paths, dtype=str),
+                     stamps=np.array(stamps, dtype=np.int64).reshape(-1, 2),
+                     offsets=offsets, sizes=sizes.astype(np.float32),
+                     labels=labels, stems=stems)
+        os.replace(tmp_path, self.cache_path)
+
+    def _parse(self, paths):
+        """Parsea los archivos indicados, en un pool de procesos si son muchos"""
+        if len(paths) < MIN_FILES_FOR_POOL or self.workers <= 1:
+            return _parse_batch(paths)
+
+        chunk = max(64, len(paths) // (self.workers * 8))
+        batches = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+        results = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for batch in pool.map(_parse_batch, batches):
+                results.extend(batch)
+        return results
+
+    def scan(self):
+        start = time.perf_counter()
+        cache = self._load_cache()
+
+        paths = self._find_label_files()
+        stamps = []
+        arrays = [None] * len(paths)
+        changed = []
+        for i, path in enumerate(paths):
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+            stamps.append(stamp)
+            cached = cache.get(path)
+            if cached and cached[0] == stamp:
+                arrays[i] = cached[1]
+            else:
+                changed.append(i)
+
+        # Solo se parsean los archivos nuevos o modificados
+        for i, boxes in zip(changed, self._parse([paths[i] for i in changed])):
+            arrays[i] = boxes
+
+        if changed or len(cache) != len(paths):
+            self._save_cache(paths, stamps, arrays)
+
+        stats = self._aggregate(paths, arrays)
+        stats["label_files"] = len(paths)
+        stats["scan"] = {
+            "parsed": len(changed),
+            "cached": len(paths) - len(changed),
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        return stats
+
+    def _select(self, paths, arrays):
+        """Una sola fuente por imagen: YOLO primero, luego el primer JSON COCO"""
+        is_yolo = [path.endswith(".txt") for path in paths]
+        # Un .txt vacío también cuenta como imagen etiquetada (sin cajas)
+        claimed = np.array([os.path.splitext(os.path.basename(p))[0]
+                            for p, y in zip(paths, is_yolo) if y], dtype=str)
+
+        selected = [arrays[i] for i in range(len(paths)) if is_yolo[i]]
+        coco = [arrays[i] for i in range(len(paths)) if not is_yolo[i]]
+        if not coco:
+            return selected, 0
+
+        # Todas las anotaciones COCO juntas; cada imagen queda con el primer
+        # archivo (en orden) que la nombra y se quitan las que tienen .txt
+        sizes, labels, stems = _concat(coco)
+        files = np.repeat(np.arange(len(coco)), [len(a[2]) for a in coco])
+        unique, first = np.unique(stems, return_index=True)
+        keep = files == files[first][np.searchsorted(unique, stems)]
+        if len(claimed):
+            keep &= ~np.isin(stems, claimed)
+
+        selected.append((sizes[keep], labels[keep], stems[keep]))
+        return selected, int(len(stems) - keep.sum())
+
+    def _class_names(self):
+        if self.class_names is not None:
+            return self.class_names
+        names = {}
+        for folder in self.label_dirs:
+            names = load_class_names(folder) or names
+        return names
+
+    def _aggregate(self, paths, arrays):
+        selected, duplicates = self._select(paths, arrays)
+        sizes, labels, _ = _concat(selected)
+        widths, heights = sizes[:, 0], sizes[:, 1]
+
+        # Índices YOLO -> nombre de clase (las categorías COCO ya vienen con nombre)
+        names = {str(k): v for k, v in self._class_names().items()}
+        classes, counts = np.unique(labels, return_counts=True)
+        by_class = {}
+        for label, n in zip(classes.tolist(), counts.tolist()):
+            name = names.get(label, label)
+            by_class[name] = by_class.get(name, 0) + n
+
+        size_hist, _ = np.histogram(np.sqrt(np.clip(widths * heights, 0, None)), bins=SIZE_BINS)
+        valid = (widths > 0) & (heights > 0)
+        aspect_hist, _ = np.histogram(np.log2(widths[valid] / heights[valid]), bins=ASPECT_BINS)
+
+        serials = np.array([_serial_from_filename(f) for f in self.image_files], dtype=str)
+        names, per_serial = (np.unique(serials, return_counts=True)
+                             if len(serials) else ([], []))
+
+        return {
+            "total_labels": int(len(labels)),
+            "duplicate_labels": duplicates,
+            "by_class": by_class,
+            "bbox_size_hist": {
+                "bins": SIZE_BINS.round(3).tolist(),
+                "counts": size_hist.tolist()
+            },
+            "bbox_aspect_hist": {
+                # Bordes como relación ancho/alto (2**log2)
+                "bins": np.exp2(ASPECT_BINS).round(3).tolist(),
+                "counts": aspect_hist.tolist()
+            },
+            "images_per_serial": {str(s): int(n) for s, n in zip(names, per_serial)}
+        }
+
+
+def _concat(arrays):
+    """Une los resultados (tamaños, clases, imágenes) de varios archivos"""
+    if not arrays:
+        return _empty()
+    return tuple(np.concatenate([a[i] for a in arrays]) for i in range(3))
@@ -0,0 +1,231 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_stages import apply_transform
+
+
+class SharedFramePool:
+    """Pool de frames en memoria compartida con slots fijos.
+
+    Los frames se escriben una sola vez en un slot y a los procesos de trabajo
+    solo se les pasa el índice del slot (sin pickle de arrays de ~2.7 MB).
+    Cada slot lleva un contador de referencias: vuelve a estar libre cuando
+    todos los que lo usan llaman a release().
+    """
+
+    def __init__(self, shape, slots=8, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+        self.refcounts = [0] * slots
+        self.lock = threading.Lock()
+        self.next_slot = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self):
+        """Reserva un slot libre (refcount=1) y retorna su índice, o None si no hay"""
+        with self.lock:
+            for i in range(self.slots):
+                idx = (self.next_slot + i) % self.slots
+                if self.refcounts[idx] == 0:
+                    self.refcounts[idx] = 1
+                    self.next_slot = (idx + 1) % self.slots
+                    return idx
+        return None
+
+    def retain(self, idx):
+        with self.lock:
+            self.refcounts[idx] += 1
+
+    def release(self, idx):
+        with self.lock:
+            if self.refcounts[idx] > 0:
+                self.refcounts[idx] -= 1
+
+    def view(self, idx):
+        """Vista numpy (sin copia) del slot"""
+        return self.frames[idx]
+
+    def write(self, frame):
+        """Copia un frame a un slot libre; retorna el índice o None"""
+        if frame.shape != self.shape or frame.dtype != self.dtype:
+            return None
+        idx = self.acquire()
+        if idx is not None:
+            np.copyto(self.frames[idx], frame)
+        return idx
+
+    def in_use(self):
+        with self.lock:
+            return sum(1 for c in self.refcounts if c)
+
+    def close(self):
+        # Soltar las vistas antes de cerrar el buffer (si no, BufferError)
+        self.frames = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameBufferPool:
+    """Buffers preasignados y reciclados para cap.read(image=...).
+
+    Cada lectura va a un buffer libre del pool; el consumidor recibe una vista
+    de solo lectura y la devuelve con release(). Así no se asigna un array
+    nuevo de ~2.7 MB por frame. hits/misses cuentan lecturas que reutilizaron
+    un buffer frente a las que tuvieron que asignar memoria.
+    """
+
+    def __init__(self, buffers=4):
+        self.max_buffers = buffers
+        self.free = []
+        self.borrowed = {}  # id(buffer) -> [buffer, referencias]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, cap):
+        """Lee un frame de cap en un buffer del pool; retorna (ok, vista)"""
+        with self.lock:
+            buf = self.free.pop() if self.free else None
+
+        ret, frame = cap.read(buf) if buf is not None else cap.read()
+        if not ret or frame is None:
+            if buf is not None:
+                with self.lock:
+                    self.free.append(buf)
+            return False, None
+
+        with self.lock:
+            if buf is not None and frame.ctypes.data == buf.ctypes.data:
+                self.hits += 1
+            else:
+                # OpenCV asignó memoria nueva (primer frame o cambio de resolución)
+                self.misses += 1
+                buf = frame
+            self.borrowed[id(buf)] = [buf, 1]
+        return True, self._view(buf)
+
+    def _view(self, buf):
+        view = buf.view()
+        view.flags.writeable = False
+        return view
+
+    def retain(self, view):
+        """Suma una referencia (otro consumidor comparte el frame)"""
+        with self.lock:
+            entry = self.borrowed.get(id(view.base))
+            if entry:
+                entry[1] += 1
+
+    def release(self, view):
+        """Devuelve el frame al pool cuando ya nadie lo usa"""
+        if view is None:
+            return
+        with self.lock:
+            entry = self.borrowed.get(id(view.base))
+            if not entry:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            buf = self.borrowed.pop(id(view.base))[0]
+            same_shape = not self.free or self.free[0].shape == buf.shape
+            if same_shape and len(self.free) + len(self.borrowed) < self.max_buffers:
+                self.free.append(buf)
+            elif not same_shape:
+                # Cambió la resolución: descartar los buffers viejos
+                self.free = [buf]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "free": len(self.free),
+                "borrowed": len(self.borrowed)
+            }
+
+
+# --- Lado del proceso de trabajo ---
+_worker_frames = None
+_worker_shm = None
+
+
+def _attach_worker(shm_name, shape, slots, dtype):
+    """Inicializador de cada proceso: se conecta una vez a la memoria compartida"""
+    global _worker_frames, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_frames = np.ndarray((slots,) + tuple(shape), dtype=dtype, buffer=_worker_shm.buf)
+
+
+def _encode_slot(idx, ext, params, transform=None):
+    """Codifica el frame del slot indicado (con ROI/reducción opcional) y retorna los bytes"""
+    import cv2
+
+    frame = _worker_frames[idx]
+    if transform:
+        frame = apply_transform(frame, transform)
+    ok, buffer = cv2.imencode(ext, frame, params or [])
+    if not ok:
+        raise ValueError(f"No se pudo codificar el frame ({ext})")
+    return buffer.tobytes()
+
+
+class EncoderPool:
+    """Codificación PNG/JPEG en un pool de procesos usando SharedFramePool"""
+
+    def __init__(self, shape, slots=8, workers=None):
+        self.frames = SharedFramePool(shape, slots)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_attach_worker,
+            initargs=(self.frames.name, self.frames.shape, slots, self.frames.dtype.str)
+        )
+
+    def submit(self, idx, ext=".png", params=None, callback=None, transform=None):
+        """Encola la codificación de un slot ya escrito.
+
+        El pool toma su propia referencia sobre el slot y la suelta al terminar,
+        así que el llamador puede hacer release() en cuanto haya enviado el trabajo.
+        callback(future) se llama desde un hilo interno del executor.
+        """
+        self.frames.retain(idx)
+        future = self.executor.submit(_encode_slot, idx, ext, params, transform)
+
+        def _done(fut):
+            self.frames.release(idx)
+            if callback:
+                callback(fut)
+
+        future.add_done_callback(_done)
+        return future
+
+    def submit_frame(self, frame, ext=".png", params=None, callback=None, transform=None):
+        """Copia un frame a un slot y lo encola; None si no hay slot disponible"""
+        idx = self.frames.write(frame)
+        if idx is None:
+            return None
+        try:
+            return self.submit(idx, ext, params, callback, transform)
+        finally:
+            self.frames.release(idx)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.frames.close()
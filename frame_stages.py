@@ -0,0 +1,57 @@
+# Etapas del camino de captura: recorte (ROI) y reducción.
+# Ambas son vistas de NumPy (slicing), sin copias; la codificación
+# posterior trabaja con menos píxeles.
+
+
+def clamp_roi(roi, shape):
+    """Ajusta un ROI (x, y, w, h) a los límites del frame; None si queda vacío"""
+    if not roi:
+        return None
+    frame_h, frame_w = shape[:2]
+    x, y, w, h = (int(round(v)) for v in roi)
+    x0, y0 = max(0, min(x, frame_w)), max(0, min(y, frame_h))
+    x1, y1 = max(x0, min(x + w, frame_w)), max(y0, min(y + h, frame_h))
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    return [x0, y0, x1 - x0, y1 - y0]
+
+
+def crop(frame, roi):
+    """Vista del frame recortada al ROI (sin copia)"""
+    if not roi:
+        return frame
+    x, y, w, h = roi
+    return frame[y:y + h, x:x + w]
+
+
+def downscale(frame, step):
+    """Reduce tomando 1 de cada `step` píxeles (vista, sin copia)"""
+    if not step or step <= 1:
+        return frame
+    return frame[::step, ::step]
+
+
+def make_transform(shape, roi=None, step=1):
+    """Describe cómo pasar de la imagen guardada al frame completo"""
+    frame_h, frame_w = shape[:2]
+    roi = clamp_roi(roi, shape)
+    return {
+        "roi": roi or [0, 0, frame_w, frame_h],
+        "scale": max(1, int(step or 1)),
+        "full_size": [frame_w, frame_h]
+    }
+
+
+def apply_transform(frame, transform):
+    """Aplica recorte + reducción descritos por make_transform"""
+    return downscale(crop(frame, transform["roi"]), transform["scale"])
+
+
+def to_full_frame(box, transform):
+    """Convierte una caja (x_min, y_min, x_max, y_max) de la imagen guardada
+    a coordenadas del frame completo"""
+    x_off, y_off = transform["roi"][:2]
+    scale = transform.get("scale", 1)
+    x_min, y_min, x_max, y_max = box
+    return (x_min * scale + x_off, y_min * scale + y_off,
+            x_max * scale + x_off, y_max * scale + y_off)
@@ -1,17 +1,27 @@
+import sys
+from startup_profile import StartupProfiler
+
+# Perfil de arranque (--profile-startup): se crea antes del resto para medir las importaciones
+PROFILER = StartupProfiler(enabled=__name__ == "__main__" and "--profile-startup" in sys.argv)
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
-import cv2
-from PIL import Image, ImageTk
 import os
+import json
 import datetime
 import threading
 import time
+import queue
 import platform
+import multiprocessing
+
+from app_config import load_config, save_config
 
-# Importar el servicio de cámara corregido
-from camera_service import CameraService
+# cv2, PIL, NumPy y los módulos de cámara/almacenamiento se importan en segundo
+# plano (App._discover) o dentro de cada método: la ventana aparece antes
+PROFILER.mark("importaciones de la interfaz")
 
 # --- Main Application ---
 class App:
@@ -20,11 +30,21 @@ class App:
         self.root.title("Captura de Troquelados - Raspberry Pi/Linux")
         self.root.geometry("1100x750")
         
-        # Servicio de cámara
-        self.camera = CameraService()
+        # Configuración
+        self.config = load_config()
+        storage_config = self.config["storage"]
+        
+        # Servicio de cámara y backend de almacenamiento: se crean en
+        # _setup_services cuando termina la carga en segundo plano
+        self.camera = None
+        self.backend = None
+        self.content_store = None
+        self.discovering = False
+        self.discovery_queue = queue.Queue()
+        self.first_preview_shown = False
         
         # Variables
-        self.storage_path = os.path.join(os.getcwd(), "capturas")
+        self.storage_path = storage_config.get("path") or os.path.join(os.getcwd(), "capturas")
         os.makedirs(self.storage_path, exist_ok=True)
         self.current_frame = None
         self.preview_image = None
@@ -32,11 +52,38 @@ class App:
         self.selected_camera = None
         self.camera_list = []
         
+        # ROI: geometría de la vista previa y arrastre en curso (coords. del frame)
+        self.preview_geometry = None
+        self.frame_shape = None
+        self.roi_start = None
+        self.roi_drag = None
+        
         # Para evitar bloqueos de GUI
         self.preview_lock = threading.Lock()
         
+        # Codificación en procesos (memoria compartida) y resultados pendientes
+        self.encoder = None
+        self.save_queue = queue.Queue()
+        # Los resultados codificados se guardan en un hilo propio: el callback del
+        # executor solo encola (el hashing/fsync/red no frena otras codificaciones)
+        self.encoded_queue = queue.Queue()
+        self.saver_thread = threading.Thread(target=self._saver_loop, daemon=True)
+        self.saver_thread.start()
+        
+        # Disparo automático, lectura de códigos y grabación (ver _setup_services)
+        self.auto_enabled = tk.BooleanVar(value=self.config["auto_trigger"].get("enabled", False))
+        self.motion_trigger = None
+        self.trigger_notice_until = 0  # Avisos del disparo visibles hasta (monotonic)
+        self.code_action = self.config["code_reader"].get("action", "fill")
+        self.code_reader = None
+        self.recorder = None
+        
         self._build_ui()
-        self.refresh_cameras()
+        PROFILER.mark("ventana construida")
+        
+        # Mostrar la ventana primero; cv2 y la búsqueda de cámaras van en un hilo
+        self.root.after_idle(self.refresh_cameras)
+        self.root.after(50, self.process_saved)
         
         # Configurar cierre limpio
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -96,6 +143,30 @@ class App:
         self.camera_info_label = ttk.Label(right_col, text="No hay cámara activa")
         self.camera_info_label.pack(pady=5)
 
+        # ROI y reducción de la imagen guardada
+        roi_frame = ttk.Frame(right_col)
+        roi_frame.pack(fill="x", pady=5)
+        
+        ttk.Label(roi_frame, text="ROI: arrastra sobre la vista previa").pack(side="left")
+        ttk.Button(roi_frame, text="✂ Borrar ROI", 
+                  command=self.clear_roi).pack(side="left", padx=5)
+        
+        ttk.Label(roi_frame, text="Reducción:").pack(side="left", padx=(10, 2))
+        self.downscale_select = ttk.Combobox(roi_frame, state="readonly", width=4,
+                                             values=["1", "2", "3", "4"])
+        self.downscale_select.set(str(self.config["capture"].get("downscale", 1)))
+        self.downscale_select.bind("<<ComboboxSelected>>", self.on_downscale_selected)
+        self.downscale_select.pack(side="left")
+
+        # Perfil del dispositivo: exposición/foco fijos para imágenes repetibles
+        profile_frame = ttk.Frame(right_col)
+        profile_frame.pack(fill="x", pady=5)
+        
+        ttk.Button(profile_frame, text="📌 Fijar exposición/foco", 
+                  command=self.lock_camera_settings).pack(side="left", padx=(0, 5))
+        ttk.Button(profile_frame, text="🔓 Automático", 
+                  command=self.unlock_camera_settings).pack(side="left")
+
         top_frame.columnconfigure(0, weight=1)
         top_frame.columnconfigure(1, weight=1)
 
@@ -107,6 +178,9 @@ class App:
                                       foreground="#0f0",
                                       font=("Arial", 12))
         self.preview_label.pack(fill="both", expand=True)
+        self.preview_label.bind("<ButtonPress-1>", self.on_roi_press)
+        self.preview_label.bind("<B1-Motion>", self.on_roi_drag)
+        self.preview_label.bind("<ButtonRelease-1>", self.on_roi_release)
 
         # --- Controles de captura ---
         capture_controls = ttk.Frame(capture_frame)
@@ -123,10 +197,23 @@ class App:
                   bootstyle="success",
                   width=15).grid(row=0, column=2, padx=5, pady=5)
         
+        if self.config["recording"].get("enabled"):
+            ttk.Button(capture_controls, text="⏺ Grabar evento", 
+                      command=self.trigger_recording, 
+                      bootstyle="danger",
+                      width=15).grid(row=0, column=3, padx=5, pady=5)
+        
         # Contador de capturas
         self.counter_label = ttk.Label(capture_controls, text="Capturas: 0")
         self.counter_label.grid(row=1, column=0, columnspan=3, pady=5)
         self.capture_count = 0
+        
+        # Disparo automático (manos libres)
+        ttk.Checkbutton(capture_controls, text="🤖 Auto-disparo", 
+                       variable=self.auto_enabled, 
+                       command=self.on_auto_toggled).grid(row=2, column=0, sticky="w", padx=5)
+        self.trigger_label = ttk.Label(capture_controls, text="")
+        self.trigger_label.grid(row=2, column=1, columnspan=2, sticky="w", padx=5)
 
         capture_controls.columnconfigure(1, weight=1)
 
@@ -137,11 +224,98 @@ class App:
             self.storage_path = folder
             self.folder_label.config(text=folder)
             os.makedirs(folder, exist_ok=True)
+            if self.backend:
+                self.backend = self.backend.relocate(folder)
+            if self.content_store:
+                self.content_store.relocate(self.backend, folder)
+
+    # --- Carga en segundo plano ---
+    def _discover(self):
+        """Hilo: importa los módulos pesados (solo la primera vez) y busca cámaras"""
+        try:
+            camera = self.camera
+            if camera is None:
+                from camera_service import CameraService  # cv2 + NumPy
+                # Precarga de lo que usarán la vista previa y el guardado
+                from PIL import Image, ImageTk  # noqa: F401
+                import storage_backends, storage_manager, content_store, frame_pool, frame_stages  # noqa: F401
+                import auto_trigger, code_reader, recorder  # noqa: F401
+                PROFILER.mark("módulos de cámara y almacenamiento importados")
+                
+                camera_config = self.config["camera"]
+                camera = CameraService(profiles_path=camera_config.get("profiles"),
+                                       keep_open=camera_config.get("keep_open", False),
+                                       source=camera_config.get("source"))
+            cameras = camera.find_cameras()
+            PROFILER.mark("búsqueda de cámaras terminada")
+            self.discovery_queue.put((camera, cameras, None))
+        except Exception as e:
+            self.discovery_queue.put((None, [], e))
+
+    def _check_discovery(self):
+        """Recoge en la GUI el resultado de _discover"""
+        try:
+            camera, cameras, error = self.discovery_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self._check_discovery)
+            return
+        
+        self.discovering = False
+        if error:
+            self.camera_select.set("Error al buscar cámaras")
+            messagebox.showerror("Error", f"No se pudo iniciar el servicio de cámara:\n{error}")
+            return
+        if self.camera is None:
+            self._setup_services(camera)
+        self._show_cameras(cameras)
+        
+        # Con --profile-startup se inicia la primera cámara para medir la primera vista previa
+        if PROFILER.enabled and not self.first_preview_shown and self.camera_list:
+            self.start_camera()
+
+    def _setup_services(self, camera):
+        """Crea los servicios que dependen de cv2/NumPy (hilo de la GUI)"""
+        from storage_backends import create_backend
+        from content_store import ContentStore
+        from auto_trigger import MotionTrigger
+        from code_reader import CodeReader
+        
+        self.camera = camera
+        storage_config = self.config["storage"]
+        self.backend = create_backend(storage_config, self.storage_path)
+        self.content_store = ContentStore(self.backend, self.storage_path,
+                                          storage_config.get("station_id")) \
+            if storage_config.get("content_addressed") else None
+        
+        # Disparo automático por movimiento/escena estable
+        trigger_config = dict(self.config["auto_trigger"])
+        trigger_config.pop("enabled", None)
+        self.motion_trigger = MotionTrigger(**trigger_config)
+        
+        # Lectura de QR/código de barras para llenar el número de parte
+        reader_config = dict(self.config["code_reader"])
+        reader_config.pop("action", None)
+        if reader_config.pop("enabled", False):
+            self.code_reader = CodeReader(**reader_config)
+            self.code_reader.start()
+        
+        # Grabación de video en segmentos (opcional)
+        self.setup_recorder()
+        PROFILER.mark("servicios listos")
 
     # --- Funciones de cámara ---
     def refresh_cameras(self):
-        """Busca cámaras disponibles"""
-        self.camera_list = self.camera.find_cameras()
+        """Busca cámaras disponibles (en segundo plano)"""
+        if self.discovering:
+            return
+        self.discovering = True
+        self.camera_select.set("Buscando cámaras...")
+        threading.Thread(target=self._discover, daemon=True).start()
+        self.root.after(50, self._check_discovery)
+
+    def _show_cameras(self, cameras):
+        """Llena la lista de cámaras encontradas"""
+        self.camera_list = cameras
         
         if not self.camera_list:
             self.camera_select['values'] = ["No se encontraron cámaras"]
@@ -153,7 +327,11 @@ class App:
             # Mostrar nombres amigables
             camera_names = []
             for cam in self.camera_list:
-                if isinstance(cam, str) and cam.startswith("/dev/video"):
+                if self.camera.source_type in ("file", "folder"):
+                    camera_names.append(f"Archivo ({os.path.basename(cam.rstrip(os.sep))})")
+                elif self.camera.source_type == "gstreamer":
+                    camera_names.append("Pipeline GStreamer")
+                elif isinstance(cam, str) and cam.startswith("/dev/video"):
                     camera_names.append(f"Cámara USB ({cam})")
                 else:
                     camera_names.append(f"Cámara {cam}")
@@ -171,6 +349,8 @@ class App:
 
     def start_camera(self):
         """Inicia la transmisión de la cámara"""
+        if self.camera is None or self.discovering:
+            return  # Todavía buscando cámaras
         if not self.camera_list:
             messagebox.showerror("Error", "No hay cámaras disponibles")
             return
@@ -186,6 +366,7 @@ class App:
             return
 
         # Intentar iniciar cámara
+        PROFILER.mark("inicio de cámara solicitado")
         if not self.camera.start(self.selected_camera):
             messagebox.showerror("Error", 
                                 f"No se pudo iniciar la cámara.\n"
@@ -201,6 +382,7 @@ class App:
         info = self.camera.get_camera_info()
         info_text = f"Resolución: {info.get('width', '?')}x{info.get('height', '?')} | FPS: {info.get('fps', '?')}"
         self.camera_info_label.config(text=info_text)
+        self.setup_encoder((info.get("height", 0), info.get("width", 0), 3))
         
         # Iniciar actualización de vista previa
         self.update_preview()
@@ -208,7 +390,8 @@ class App:
     def stop_camera(self):
         """Detiene la transmisión de la cámara"""
         self.streaming = False
-        self.camera.stop()
+        if self.camera:
+            self.camera.pause()  # Con keep_open el dispositivo queda abierto
         self.camera_btn.config(text="▶ Iniciar", bootstyle="default")
         self.camera_select.config(state="readonly")
         self.camera_info_label.config(text="Cámara detenida")
@@ -218,12 +401,42 @@ class App:
                                  text="🖥️ Vista previa\n\nCámara detenida",
                                  foreground="#888")
 
+    def on_source_finished(self):
+        """Terminó el video/carpeta (sin loop): detener y avisar en la interfaz"""
+        self.stop_camera()
+        self.camera.stop()  # Aun con keep_open: no hay nada que reanudar
+        print("⏹ Fuente terminada")
+        self.camera_info_label.config(text="Fin del video/carpeta")
+        self.preview_label.config(image='',
+                                 text="🖥️ Vista previa\n\n⏹ Fin del video/carpeta",
+                                 foreground="#888")
+
     def update_preview(self):
         """Actualiza la vista previa de la cámara"""
         if not self.streaming:
             return
+        import cv2
+        from PIL import Image, ImageTk
 
         frame = self.camera.get_frame()
+        if frame is None and getattr(self.camera.cap, "finished", False):
+            self.on_source_finished()
+            return
+        if frame is not None and self.code_reader:
+            # Solo entrega el frame si el lector está libre (límite de frecuencia)
+            self.code_reader.submit(frame)
+            code = self.code_reader.poll()
+            if code:
+                self.on_code_read(code)
+        
+        if frame is not None and self.auto_enabled.get():
+            # Pocos µs por frame: trabaja sobre una versión reducida en grises
+            if self.motion_trigger.update(frame):
+                self.root.after_idle(lambda: self.capture(auto=True))
+            if time.monotonic() >= self.trigger_notice_until:
+                self.trigger_label.config(
+                    text=f"{self.motion_trigger.state} (mov. {self.motion_trigger.motion:.1%})")
+        
         if frame is not None:
             # Redimensionar para vista previa (mantener aspect ratio)
             h, w = frame.shape[:2]
@@ -235,6 +448,21 @@ class App:
             
             if new_w > 0 and new_h > 0:
                 frame_resized = cv2.resize(frame, (new_w, new_h))
+                self.preview_geometry = (ratio, new_w, new_h)
+                self.frame_shape = frame.shape
+                
+                # Indicador de grabación
+                if self.recorder and self.recorder.recording:
+                    cv2.circle(frame_resized, (new_w - 25, 25), 10, (0, 0, 255), -1)
+                
+                # Dibujar ROI (el que se está arrastrando o el guardado)
+                roi = self.roi_drag or self.current_roi()
+                if roi:
+                    x, y, rw, rh = roi
+                    cv2.rectangle(frame_resized,
+                                (int(x * ratio), int(y * ratio)),
+                                (int((x + rw) * ratio), int((y + rh) * ratio)),
+                                (0, 255, 255), 2)
                 
                 # Dibujar información en el frame
                 part_number = self.part_entry.get().strip() or "N/A"
@@ -264,78 +492,346 @@ class App:
                 frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
                 img = Image.fromarray(frame_rgb)
                 self.preview_image = ImageTk.PhotoImage(img)
+                if not self.first_preview_shown:
+                    self.first_preview_shown = True
+                    PROFILER.mark("primera vista previa")
+                    PROFILER.report()
                 
                 self.preview_label.config(image=self.preview_image, text="")
         
+        # Devolver el buffer al pool para la próxima lectura
+        self.camera.release_frame(frame)
+        
         # Programar próxima actualización (ajustar FPS)
-        self.root.after(30, self.update_preview)  # ~33 FPS
+        # ~33 FPS; un video/carpeta sin realtime se procesa lo más rápido posible
+        self.root.after(1 if self.camera.fast_replay else 30, self.update_preview)
 
-    # --- Captura de imágenes ---
-    def capture(self):
-        """Captura una imagen"""
-        if not self.streaming or self.camera.cap is None:
+    def lock_camera_settings(self):
+        """Fija los valores actuales de exposición/foco en el perfil del dispositivo"""
+        if not self.streaming:
             messagebox.showerror("Error", "Inicia la cámara primero")
             return
+        values = self.camera.lock_current_settings()
+        if values:
+            detail = "\n".join(f"{k}: {v:g}" for k, v in values.items())
+            messagebox.showinfo("Perfil guardado", f"Valores fijados:\n{detail}")
+        else:
+            messagebox.showwarning("Advertencia", "La cámara no reporta controles manuales")
+
+    def unlock_camera_settings(self):
+        if self.camera:
+            self.camera.unlock_settings()
+
+    # --- ROI ---
+    def current_roi(self):
+        """ROI guardado para la cámara seleccionada (coordenadas del frame)"""
+        return self.config["capture"]["roi"].get(str(self.selected_camera))
+
+    def _preview_to_frame(self, event):
+        """Convierte un punto de la vista previa a coordenadas del frame"""
+        if not self.preview_geometry:
+            return None
+        ratio, img_w, img_h = self.preview_geometry
+        # La imagen está centrada dentro del label
+        off_x = (self.preview_label.winfo_width() - img_w) / 2
+        off_y = (self.preview_label.winfo_height() - img_h) / 2
+        x = min(max(event.x - off_x, 0), img_w) / ratio
+        y = min(max(event.y - off_y, 0), img_h) / ratio
+        return x, y
+
+    def on_roi_press(self, event):
+        point = self._preview_to_frame(event) if self.streaming else None
+        self.roi_start = point
+        self.roi_drag = None
+
+    def on_roi_drag(self, event):
+        if not self.roi_start:
+            return
+        x0, y0 = self.roi_start
+        x1, y1 = self._preview_to_frame(event)
+        self.roi_drag = [min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0)]
+
+    def on_roi_release(self, event):
+        if self.roi_drag and self.frame_shape is not None:
+            from frame_stages import clamp_roi
+            roi = clamp_roi(self.roi_drag, self.frame_shape)
+            if roi:
+                self.config["capture"]["roi"][str(self.selected_camera)] = roi
+                save_config(self.config)
+        self.roi_start = None
+        self.roi_drag = None
+
+    def clear_roi(self):
+        if self.config["capture"]["roi"].pop(str(self.selected_camera), None):
+            save_config(self.config)
+
+    def on_downscale_selected(self, event=None):
+        self.config["capture"]["downscale"] = int(self.downscale_select.get())
+        save_config(self.config)
+
+    # --- Disparo automático ---
+    def on_auto_toggled(self):
+        if self.motion_trigger:
+            self.motion_trigger.reset()
+            self.trigger_label.config(text="" if not self.auto_enabled.get() else self.motion_trigger.state)
+        self.config["auto_trigger"]["enabled"] = self.auto_enabled.get()
+        save_config(self.config)
+
+    # --- Lectura de códigos ---
+    def on_code_read(self, code):
+        """Llena el número de parte con el código leído (y captura si se configuró)"""
+        self.part_entry.delete(0, "end")
+        self.part_entry.insert(0, code)
+        print(f"🏷️ Código leído: {code}")
+        if self.code_action == "capture":
+            self.root.after_idle(lambda: self.capture(auto=True))
+
+    # --- Grabación de video ---
+    def setup_recorder(self):
+        recording = dict(self.config["recording"])
+        if not recording.pop("enabled", False):
+            return
+        folder = recording.pop("folder", None) or os.path.join(self.storage_path, "videos")
+        try:
+            from recorder import SegmentRecorder
+            self.recorder = SegmentRecorder(folder, **recording)
+            self.camera.attach_recorder(self.recorder)
+        except Exception as e:
+            print(f"⚠️ Grabación no disponible: {e}")
+            self.recorder = None
 
-        frame = self.camera.get_frame()
-        if frame is None:
-            messagebox.showerror("Error", "No se pudo obtener imagen de la cámara")
+    def trigger_recording(self):
+        """Guarda los segundos previos y posteriores al evento"""
+        if not self.streaming:
+            messagebox.showerror("Error", "Inicia la cámara primero")
+            return
+        if self.recorder:
+            self.recorder.trigger()
+
+    # --- Codificación en segundo plano ---
+    def setup_encoder(self, shape):
+        """Crea (o reutiliza) el pool de procesos de codificación para esta resolución"""
+        encoding = self.config["encoding"]
+        if encoding.get("processes") == 0 or min(shape) <= 0:
+            return
+        if self.encoder and self.encoder.frames.shape == tuple(shape):
+            return
+        
+        self.close_encoder()
+        try:
+            from frame_pool import EncoderPool
+            self.encoder = EncoderPool(shape, slots=encoding.get("slots", 8),
+                                       workers=encoding.get("processes"))
+        except Exception as e:
+            print(f"⚠️ Codificación en procesos no disponible: {e}")
+            self.encoder = None
+
+    def close_encoder(self):
+        if self.encoder:
+            self.encoder.close()
+            self.encoder = None
+
+    def save_encoded(self, filename, future, auto=False):
+        """Callback de un trabajo de codificación (hilo del executor): solo encola"""
+        self.encoded_queue.put((filename, future, auto))
+
+    def _saver_loop(self):
+        """Hilo de guardado: escribe los resultados codificados a través del backend"""
+        while True:
+            item = self.encoded_queue.get()
+            if item is None:
+                break
+            filename, future, auto = item
+            try:
+                filepath = self.store_capture(filename, future.result())
+                self.save_queue.put((filepath, None, auto))
+            except Exception as e:
+                self.save_queue.put((None, e, auto))
+
+    def close_saver(self):
+        """Termina de guardar lo encolado y detiene el hilo de guardado"""
+        self.encoded_queue.put(None)
+        self.saver_thread.join(timeout=30)
+
+    def store_capture(self, filename, data):
+        """Guarda la imagen codificada (por contenido si está activado)"""
+        if self.content_store:
+            return self.content_store.put(data, filename, "image/png")[0]
+        return self.backend.put(filename, data)
+
+    def process_saved(self):
+        """Muestra en la GUI los guardados terminados en segundo plano"""
+        try:
+            while True:
+                filepath, error, auto = self.save_queue.get_nowait()
+                if error:
+                    self.finish_auto_capture(auto, False)
+                    self.capture_error(auto, f"No se pudo guardar la imagen:\n{str(error)}")
+                else:
+                    self.on_capture_saved(filepath, auto)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.process_saved)
+
+    def on_capture_saved(self, filepath, auto):
+        """Confirmación común a los guardados directo y en segundo plano"""
+        self.capture_count += 1
+        self.counter_label.config(text=f"Capturas: {self.capture_count}")
+        print(f"✅ Imagen guardada en: {filepath}")
+        self.finish_auto_capture(auto, True)
+        if not auto:
+            messagebox.showinfo("✅ Captura exitosa", 
+                              f"Imagen guardada en:\n{filepath}")
+
+    def capture_error(self, auto, message):
+        """Error de captura: diálogo en modo manual; en automático, aviso sin
+        bloquear (un diálogo modal detendría la vista previa y el disparo)"""
+        if not auto:
+            messagebox.showerror("Error", message)
+            return
+        print(f"⚠️ {message}")
+        self.trigger_label.config(text="⚠️ " + " ".join(message.split("\n")))
+        self.trigger_notice_until = time.monotonic() + 3
+
+    def finish_auto_capture(self, auto, saved):
+        """Informa al disparo automático si la pieza quedó capturada"""
+        if not auto or not self.motion_trigger:
+            return
+        if saved:
+            self.motion_trigger.confirm()
+        else:
+            self.motion_trigger.cancel()
+
+    # --- Captura de imágenes ---
+    def capture(self, auto=False):
+        """Captura una imagen.
+
+        Con auto=True (disparo automático) no se muestran diálogos modales y
+        se conserva el número de parte para la siguiente pieza.
+        """
+        if not self.streaming or self.camera.cap is None:
+            self.finish_auto_capture(auto, False)
+            if not auto:
+                messagebox.showerror("Error", "Inicia la cámara primero")
             return
 
         part_number = self.part_entry.get().strip()
 
         # Uncomment for regular app.
         if not part_number:
+            if auto:
+                # El disparo reintenta solo; el aviso queda visible unos segundos
+                self.finish_auto_capture(auto, False)
+                self.capture_error(auto, "Falta número de parte")
+                return
             messagebox.showerror("Error", "Ingresa un número de parte / Kanban")
             self.part_entry.focus()
             return
+
+        import cv2
+        from frame_stages import crop, downscale, make_transform
+        from storage_backends import encode_image
+        from storage_manager import StorageManager
+
+        # Leer directo a memoria compartida si hay pool; si no, frame normal
+        slot = None
+        if self.encoder:
+            slot = self.camera.get_frame_slot(self.encoder.frames)
+        if slot is not None:
+            frame = self.encoder.frames.view(slot)
+        else:
+            frame = self.camera.get_frame()
+        if frame is None:
+            self.finish_auto_capture(auto, False)
+            self.capture_error(auto, "No se pudo obtener imagen de la cámara")
+            return
         
 
-        # Crear nombre de archivo
+        # Crear nombre de archivo (con milisegundos: el modo automático conserva
+        # el número de parte y puede capturar dos veces en el mismo segundo)
         now = datetime.datetime.now()
-        filename = f"{part_number}_{now.strftime('%Y%m%d_%H%M%S')}.png"
-        filepath = os.path.join(self.storage_path, filename)
+        filename = f"{part_number}_{now.strftime('%Y%m%d_%H%M%S')}{now.microsecond // 1000:03d}.png"
 
         try:
-            # Añadir texto a la imagen guardada
+            # ROI y reducción: solo vistas del frame, sin copias
+            transform = make_transform(frame.shape, self.current_roi(),
+                                       self.config["capture"].get("downscale", 1))
+            region = crop(frame, transform["roi"])
+            if slot is None:
+                # El frame del pool es de solo lectura: copiar solo el ROI
+                region = region.copy()
+            
+            # Añadir texto a la imagen guardada (dentro del ROI)
             now_text = datetime.datetime.now().strftime("%H:%M:%S %d-%m-%Y")
             font = cv2.FONT_HERSHEY_SIMPLEX
             
             # Para la imagen guardada, texto más grande
-            cv2.putText(frame, f"Parte: {part_number}", (20, 40),
+            cv2.putText(region, f"Parte: {part_number}", (20, 40),
                        font, 1.2, (0, 255, 0), 2, cv2.LINE_AA)
-            cv2.putText(frame, f"Fecha: {now_text}", (20, 80),
+            cv2.putText(region, f"Fecha: {now_text}", (20, 80),
                        font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
 
-            # Guardar imagen
-            cv2.imwrite(filepath, frame)
-            
-            # Actualizar contador
-            self.capture_count += 1
-            self.counter_label.config(text=f"Capturas: {self.capture_count}")
-            
-            # Mostrar confirmación 
-            # Uncomment for regular app
-            messagebox.showinfo("✅ Captura exitosa", 
-                              f"Imagen guardada en:\n{filepath}")
+            # Registrar ROI en los metadatos para mapear anotaciones al frame completo
+            h, w = frame.shape[:2]
+            if transform["roi"] != [0, 0, w, h] or transform["scale"] > 1:
+                metadata = {
+                    "part_number": part_number,
+                    "timestamp": now.isoformat(),
+                    "filename": filename,
+                    "transform": transform
+                }
+                # Misma clave que lee StorageManager._load_transform al anotar
+                meta_key = f"{StorageManager.KEYS['annotations']}/{os.path.splitext(filename)[0]}.json"
+                self.backend.put(meta_key, json.dumps(metadata, indent=2).encode("utf-8"),
+                                 "application/json")
+
+            if slot is not None:
+                # Solo viaja el índice del slot; el guardado se confirma en process_saved
+                self.encoder.submit(slot, ".png", transform=transform,
+                                    callback=lambda fut, name=filename: self.save_encoded(name, fut, auto))
+            else:
+                # Guardar imagen a través del backend de almacenamiento
+                output = downscale(region, transform["scale"])
+                filepath = self.store_capture(filename, encode_image(output, ".png"))
+                self.on_capture_saved(filepath, auto)
             
             # Limpiar campo y preparar para siguiente captura
-            self.part_entry.delete(0, "end")
+            if not auto:
+                self.part_entry.delete(0, "end")
             self.part_entry.focus()
             
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo guardar la imagen:\n{str(e)}")
+            self.finish_auto_capture(auto, False)
+            self.capture_error(auto, f"No se pudo guardar la imagen:\n{str(e)}")
+        finally:
+            if slot is not None:
+                self.encoder.frames.release(slot)
+            else:
+                self.camera.release_frame(frame)
 
     def on_closing(self):
         """Maneja el cierre de la aplicación"""
         self.stop_camera()
+        if self.camera:
+            self.camera.stop()  # Liberar el dispositivo aunque esté en pausa
+            self.camera.attach_recorder(None)  # Cierra el segmento en curso
+        if self.code_reader:
+            self.code_reader.stop()
+        self.close_encoder()  # Espera a que terminen las codificaciones pendientes
+        self.close_saver()
+        if self.backend:
+            self.backend.close()  # Lo pendiente queda en el outbox para el próximo inicio
+        PROFILER.report()  # Si se cerró antes de la primera vista previa
         self.root.destroy()
 
 # --- Ejecutar aplicación ---
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necesario para el pool de procesos en PyInstaller
     print("🚀 Iniciando aplicación de captura...")
     print(f"Sistema: {platform.system()}")
     
     root = tb.Window(themename="darkly")
+    PROFILER.mark("ventana Tk creada")
     app = App(root)
+    root.after_idle(PROFILER.mark, "bucle de eventos iniciado")
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import datetime
+import threading
+from collections import deque
+
+import cv2
+
+
+class SegmentRecorder:
+    """Grabación de video en segmentos con buffer previo al disparo.
+
+    CameraService entrega cada frame con push(), que solo copia el frame a una
+    cola acotada (si el grabador se atrasa se descartan frames, nunca se bloquea
+    la vista previa). Un hilo propio comprime los frames al buffer circular en
+    memoria (JPEG) y, al dispararse o en modo continuo, escribe segmentos con
+    cv2.VideoWriter.
+
+    Cada frame lleva la hora de llegada: el video se escribe a fps fijos
+    repitiendo o saltando frames según esa hora, así la duración coincide con
+    la real aunque la cámara entregue menos (o más) cuadros que fps.
+    """
+
+    def __init__(self, folder, mode="trigger", fps=30, pre_seconds=5, post_seconds=5,
+                 segment_seconds=60, codec="mp4v", extension=".mp4",
+                 retention_segments=100, retention_hours=24, buffer_quality=80,
+                 queue_size=8):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.mode = mode
+        self.fps = fps
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.segment_seconds = segment_seconds
+        self.codec = codec
+        self.extension = extension
+        self.retention_segments = retention_segments
+        self.retention_hours = retention_hours
+        self.buffer_quality = buffer_quality
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        # (hora, JPEG) de los últimos pre_seconds; maxlen solo acota la memoria
+        self.pre_buffer = deque(maxlen=max(1, int(pre_seconds * fps * 2)))
+        self.dropped = 0
+        self.next_slot = None  # Hora del próximo cuadro del video (monotonic)
+
+        self.writer = None
+        self.writer_size = None
+        self.segment_start = 0
+        self.segment_path = None
+        self.record_until = 0  # Fin de la grabación disparada (monotonic)
+        self.pending_trigger = threading.Event()
+
+        self.running = False
+        self.thread = None
+
+    # --- Lado de la cámara (debe ser barato) ---
+    def push(self, frame):
+        if not self.running:
+            return
+        # Copiar solo si hay lugar en la cola
+        if self.frames.full():
+            self.dropped += 1
+            return
+        try:
+            self.frames.put_nowait((time.monotonic(), frame.copy()))
+        except queue.Full:
+            self.dropped += 1
+
+    def trigger(self, post_seconds=None):
+        """Graba el buffer previo y los próximos post_seconds segundos"""
+        self.record_until = time.monotonic() + (self.post_seconds if post_seconds is None
+                                                else post_seconds)
+        self.pending_trigger.set()
+
+    @property
+    def recording(self):
+        return self.writer is not None
+
+    # --- Hilo de grabación ---
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+        self._close_segment()
+
+    def _run(self):
+        while self.running:
+            try:
+                stamp, frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                stamp, frame = None, None
+
+            now = time.monotonic()
+            active = self.mode == "continuous" or now < self.record_until
+
+            if self.pending_trigger.is_set() and frame is not None:
+                self.pending_trigger.clear()
+                if not self.writer:
+                    self._open_segment(frame.shape)
+                    self._flush_pre_buffer(stamp)
+
+            if frame is None:
+                if not active:
+                    self._close_segment()
+                continue
+
+            if active:
+                if self.writer and (frame.shape[:2] != self.writer_size or
+                                    now - self.segment_start >= self.segment_seconds):
+                    self._close_segment()
+                if not self.writer:
+                    self._open_segment(frame.shape)
+                if self.writer:
+                    self._write(frame, stamp)
+            else:
+                self._close_segment()
+                ok, jpeg = cv2.imencode(".jpg", frame,
+                                        [cv2.IMWRITE_JPEG_QUALITY, self.buffer_quality])
+                if ok:
+                    self.pre_buffer.append((stamp, jpeg))
+                    while self.pre_buffer and self.pre_buffer[0][0] < stamp - self.pre_seconds:
+                        self.pre_buffer.popleft()
+
+    def _write(self, frame, stamp):
+        """Escribe el frame tantas veces como cuadros del video cubre su hora"""
+        period = 1.0 / self.fps
+        if self.next_slot is None:
+            self.next_slot = stamp
+        count = 0
+        while self.next_slot <= stamp and count < self.fps:
+            self.next_slot += period
+            count += 1
+        if self.next_slot <= stamp:
+            # Hueco de más de un segundo (cámara trabada): no rellenarlo entero
+            self.next_slot = stamp + period
+        for _ in range(count):
+            self.writer.write(frame)
+
+    def _flush_pre_buffer(self, trigger_stamp):
+        """Escribe al segmento los frames de los pre_seconds previos al disparo"""
+        while self.pre_buffer:
+            stamp, jpeg = self.pre_buffer.popleft()
+            if stamp < trigger_stamp - self.pre_seconds:
+                continue
+            frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+            if frame is not None and frame.shape[:2] == self.writer_size:
+                self._write(frame, stamp)
+
+    def _open_segment(self, shape):
+        height, width = shape[:2]
+        name = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        self.segment_path = os.path.join(self.folder, f"seg_{name}{self.extension}")
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        self.writer = cv2.VideoWriter(self.segment_path, fourcc, self.fps, (width, height))
+        if not self.writer.isOpened():
+            print(f"❌ No se pudo abrir el video {self.segment_path} (codec {self.codec})")
+            self.writer = None
+            # Evitar reintentar en cada frame hasta el próximo disparo
+            self.record_until = 0
+            return
+        self.writer_size = (height, width)
+        self.segment_start = time.monotonic()
+        self.next_slot = None
+        print(f"⏺ Grabando segmento: {self.segment_path}")
+
+    def _close_segment(self):
+        if not self.writer:
+            return
+        self.writer.release()
+        self.writer = None
+        self.writer_size = None
+        print(f"⏹ Segmento guardado: {self.segment_path}")
+        self._apply_retention()
+
+    def _apply_retention(self):
+        """Borra los segmentos más viejos según cantidad y antigüedad"""
+        segments = sorted(
+            os.path.join(self.folder, f) for f in os.listdir(self.folder)
+            if f.startswith("seg_") and f.endswith(self.extension)
+        )
+        cutoff = time.time() - self.retention_hours * 3600 if self.retention_hours else None
+        excess = len(segments) - self.retention_segments if self.retention_segments else 0
+        for i, path in enumerate(segments):
+            try:
+                if i < excess or (cutoff and os.path.getmtime(path) < cutoff):
+                    os.remove(path)
+            except OSError as e:
+                print(f"⚠️ No se pudo borrar {path}: {e}")
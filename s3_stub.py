@@ -0,0 +1,199 @@
+import os
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.sax.saxutils import escape
+
+# Servidor S3 mínimo para probar ObjectStoreBackend sin MinIO ni red.
+# Soporta PUT/GET/HEAD/DELETE, multipart upload y ListObjectsV2 (prefix,
+# delimiter, paginación). Exige la cabecera Authorization pero no valida la
+# firma. Los objetos se guardan en memoria (o en una carpeta con --folder).
+
+
+class StubStore:
+    """Objetos por (bucket, clave) y subidas multipart en curso"""
+
+    def __init__(self, folder=None):
+        self.folder = folder
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def put(self, bucket, key, data):
+        with self.lock:
+            self.objects[(bucket, key)] = (data, time.time())
+        if self.folder:
+            path = os.path.join(self.folder, bucket, *key.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def get(self, bucket, key):
+        with self.lock:
+            return self.objects.get((bucket, key))
+
+    def delete(self, bucket, key):
+        with self.lock:
+            self.objects.pop((bucket, key), None)
+
+    def keys(self, bucket, prefix):
+        with self.lock:
+            return sorted(
+                (key, len(data), modified)
+                for (b, key), (data, modified) in self.objects.items()
+                if b == bucket and key.startswith(prefix)
+            )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = None
+    page_size = 1000
+
+    def log_message(self, *args):
+        pass
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        parts = unquote(url.path).lstrip("/").split("/", 1)
+        bucket = parts[0]
+        key = parts[1] if len(parts) > 1 else ""
+        query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        return bucket, key, query, body
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, code):
+        self._send(status, f"<Error><Code>{code}</Code></Error>".encode())
+
+    def _authorized(self):
+        if not self.headers.get("Authorization", "").startswith("AWS4-HMAC-SHA256"):
+            self._error(403, "AccessDenied")
+            return False
+        return True
+
+    def do_PUT(self):
+        bucket, key, query, body = self._parse()
+        if not self._authorized():
+            return
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if "uploadId" in query:
+            upload = self.store.uploads.get(query["uploadId"])
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            upload["parts"][int(query["partNumber"])] = body
+        else:
+            self.store.put(bucket, key, body)
+        self._send(200, headers={"ETag": etag})
+
+    def do_POST(self):
+        bucket, key, query, body = self._parse()
+        if not self._authorized():
+            return
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self.store.uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {}}
+            xml = (f"<InitiateMultipartUploadResult><Bucket>{escape(bucket)}</Bucket>"
+                   f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                   f"</InitiateMultipartUploadResult>")
+            return self._send(200, xml.encode())
+        upload = self.store.uploads.pop(query.get("uploadId"), None)
+        if upload is None:
+            return self._error(404, "NoSuchUpload")
+        parts = upload["parts"]
+        self.store.put(bucket, key, b"".join(parts[n] for n in sorted(parts)))
+        self._send(200, b"<CompleteMultipartUploadResult/>")
+
+    def do_GET(self):
+        bucket, key, query, _ = self._parse()
+        if not self._authorized():
+            return
+        if not key:
+            return self._list(bucket, query)
+        item = self.store.get(bucket, key)
+        if item is None:
+            return self._error(404, "NoSuchKey")
+        self._send(200, item[0])
+
+    def do_HEAD(self):
+        bucket, key, _, _ = self._parse()
+        if not self._authorized():
+            return
+        item = self.store.get(bucket, key)
+        if item is None:
+            return self._send(404)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(item[0])))
+        self.end_headers()
+
+    def do_DELETE(self):
+        bucket, key, _, _ = self._parse()
+        if not self._authorized():
+            return
+        self.store.delete(bucket, key)
+        self._send(204)
+
+    def _list(self, bucket, query):
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter")
+        start = int(query.get("continuation-token") or 0)
+
+        entries = []
+        prefixes = set()
+        for key, size, modified in self.store.keys(bucket, prefix):
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+                continue
+            entries.append((key, size, modified))
+
+        page = entries[start:start + self.page_size]
+        truncated = start + self.page_size < len(entries)
+        xml = ["<ListBucketResult>", f"<Name>{escape(bucket)}</Name>",
+               f"<Prefix>{escape(prefix)}</Prefix>", f"<KeyCount>{len(page)}</KeyCount>",
+               f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"]
+        if truncated:
+            xml.append(f"<NextContinuationToken>{start + self.page_size}</NextContinuationToken>")
+        for key, size, modified in page:
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(modified))
+            xml.append(f"<Contents><Key>{escape(key)}</Key><Size>{size}</Size>"
+                       f"<LastModified>{stamp}</LastModified></Contents>")
+        for common in sorted(prefixes):
+            xml.append(f"<CommonPrefixes><Prefix>{escape(common)}</Prefix></CommonPrefixes>")
+        xml.append("</ListBucketResult>")
+        self._send(200, "".join(xml).encode(), {"Content-Type": "application/xml"})
+
+
+def start_stub(port=0, folder=None, page_size=1000):
+    """Arranca el servidor en un hilo; retorna (servidor, endpoint)"""
+    handler = type("Handler", (StubHandler,), {"store": StubStore(folder), "page_size": page_size})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor S3 mínimo para pruebas locales")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--folder", help="Guardar también los objetos en esta carpeta")
+    args = parser.parse_args()
+
+    server, endpoint = start_stub(args.port, args.folder)
+    print(f"✅ S3 de prueba en {endpoint} (cualquier bucket/credenciales). Ctrl+C para salir")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
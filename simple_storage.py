@@ -2,12 +2,15 @@ import os
 import datetime
 from tkinter import filedialog
 
+from storage_backends import LocalStorageBackend, encode_image
+
 class SimpleStorage:
     """Gestor de almacenamiento simple sin dependencias extra"""
     
-    def __init__(self, base_folder=None):
+    def __init__(self, base_folder=None, backend=None):
         self.folder = base_folder or os.path.join(os.getcwd(), "capturas")
         os.makedirs(self.folder, exist_ok=True)
+        self.backend = backend or LocalStorageBackend(self.folder)
     
     def get_path(self):
         return self.folder
@@ -18,59 +21,37 @@ class SimpleStorage:
         if folder:
             self.folder = folder
             os.makedirs(folder, exist_ok=True)
+            self.backend = self.backend.relocate(folder)
         return self.folder
     
     def save_image(self, image_array, part_number):
         """Guarda una imagen con número de parte"""
         now = datetime.datetime.now()
-        filename = f"{part_number}_{now.strftime('%Y%m%d_%H%M%S')}.png"
-        filepath = os.path.join(self.folder, filename)
+        # Con milisegundos para no pisar capturas del mismo segundo
+        filename = f"{part_number}_{now.strftime('%Y%m%d_%H%M%S')}{now.microsecond // 1000:03d}.png"
         
         try:
-            import cv2
-            cv2.imwrite(filepath, image_array)
-            return filepath
+            # encode_image usa OpenCV y recurre a PIL si falla
+            data = encode_image(image_array, ".png")
+            return self.backend.put(filename, data)
         except Exception as e:
-            print(f"Error al guardar con OpenCV: {e}")
-            
-            # Intentar con PIL
-            try:
-                from PIL import Image
-                if isinstance(image_array, Image.Image):
-                    image_array.save(filepath)
-                else:
-                    # Convertir numpy array a PIL
-                    image_pil = Image.fromarray(image_array)
-                    image_pil.save(filepath)
-                return filepath
-            except Exception as e2:
-                print(f"Error al guardar con PIL: {e2}")
-                return None
+            print(f"Error al guardar imagen: {e}")
+            return None
     
     def get_image_count(self):
         """Cuenta cuántas imágenes hay en la carpeta"""
-        if not os.path.exists(self.folder):
-            return 0
-        
-        count = 0
-        for file in os.listdir(self.folder):
-            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-                count += 1
-        
-        return count
+        return len(self.list_images())
     
     def list_images(self):
         """Lista todas las imágenes disponibles"""
         images = []
-        if not os.path.exists(self.folder):
-            return images
-        
-        for file in os.listdir(self.folder):
+        for item in self.backend.list():
+            file = os.path.basename(item['key'])
             if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
                 images.append({
                     'filename': file,
-                    'path': os.path.join(self.folder, file),
-                    'size': os.path.getsize(os.path.join(self.folder, file))
+                    'path': item['path'],
+                    'size': item['size']
                 })
         
         return images
\ No newline at end of file
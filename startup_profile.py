@@ -0,0 +1,77 @@
+import sys
+import time
+import builtins
+import threading
+
+
+class StartupProfiler:
+    """Desglose del arranque (--profile-startup): fases e importaciones.
+
+    mark() registra el tiempo transcurrido desde que se creó el perfilador;
+    las importaciones se miden envolviendo __import__, con el tiempo
+    acumulado (incluye dependencias) de cada paquete la primera vez que se
+    carga. Deshabilitado no hace nada.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self.imports = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.original_import = None
+        self.reported = False
+        if enabled:
+            self.original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        package = name.split(".")[0]
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        # Ya cargado (o ya se está midiendo más arriba en la pila): sin medir
+        if level or package in stack or (name in sys.modules and not fromlist):
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        stack.append(package)
+        t0 = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - t0
+            stack.pop()
+            if elapsed >= 0.001:  # Ignorar lo que ya estaba en caché
+                with self.lock:
+                    self.imports[package] = self.imports.get(package, 0) + elapsed
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.phases.append((phase, time.perf_counter() - self.start,
+                                threading.current_thread().name))
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def report(self, top=15):
+        """Imprime el desglose (una sola vez) y restaura __import__"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        if self.original_import:
+            builtins.__import__ = self.original_import
+
+        print("⏱ Perfil de arranque")
+        previous = 0
+        for phase, at, thread in sorted(self.phases, key=lambda p: p[1]):
+            where = "" if thread == "MainThread" else f"  [{thread}]"
+            print(f"  {at * 1000:8.1f} ms  (+{(at - previous) * 1000:7.1f})  {phase}{where}")
+            previous = at
+
+        print("  Importaciones (acumulado con dependencias):")
+        ranked = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+        for package, seconds in ranked[:top]:
+            print(f"  {seconds * 1000:8.1f} ms  {package}")
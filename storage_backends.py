@@ -0,0 +1,598 @@
+import os
+import io
+import json
+import time
+import hmac
+import hashlib
+import datetime
+import mimetypes
+import threading
+import http.client
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit, quote
+
+# Extensiones que se tratan como imágenes (listados, conversión, fuentes de carpeta)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+
+
+def encode_image(image, ext=".png", params=None):
+    """Codifica una imagen (numpy/PIL/bytes) al formato indicado y retorna bytes"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+
+    try:
+        import cv2
+        import numpy as np
+
+        if isinstance(image, np.ndarray):
+            ok, buffer = cv2.imencode(ext, image, params or [])
+            if ok:
+                return buffer.tobytes()
+    except Exception as e:
+        print(f"Error al codificar con OpenCV: {e}")
+
+    # Fallback: PIL
+    from PIL import Image
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(image)
+    fmt = {".jpg": "JPEG", ".jpeg": "JPEG", ".bmp": "BMP",
+           ".tif": "TIFF", ".tiff": "TIFF"}.get(ext.lower(), "PNG")
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def _content_type(key):
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class StorageBackend:
+    """Interfaz común de almacenamiento.
+
+    Las claves son rutas relativas separadas por '/' (ej. "images/123.png").
+    """
+
+    def put(self, key, data, content_type=None):
+        """Guarda bytes bajo una clave y retorna la ruta/URI resultante"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Retorna los bytes de una clave"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def list(self, prefix=""):
+        """Lista objetos: [{"key", "path", "size", "modified"}]"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Ruta local de la clave si existe una copia en disco, o None"""
+        return None
+
+    def uri(self, key):
+        """Identificador legible de la clave en este backend"""
+        return key
+
+    def relocate(self, root):
+        """Retorna un backend equivalente con nueva carpeta raíz local"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LocalStorageBackend(StorageBackend):
+    """Backend en sistema de archivos local"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        parts = [p for p in key.replace("\\", "/").split("/") if p not in ("", ".")]
+        if ".." in parts:
+            raise ValueError(f"Clave inválida: {key}")
+        return os.path.join(self.root, *parts)
+
+    def put(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: nunca queda un archivo a medias
+        tmp_path = path + ".part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, prefix=""):
+        base = self._path(prefix) if prefix else self.root
+        if not os.path.isdir(base):
+            return []
+
+        items = []
+        for entry in os.scandir(base):
+            if not entry.is_file() or entry.name.endswith(".part"):
+                continue
+            st = entry.stat()
+            key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+            items.append({
+                "key": key,
+                "path": entry.path,
+                "size": st.st_size,
+                "modified": st.st_mtime
+            })
+        return items
+
+    def local_path(self, key):
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def uri(self, key):
+        return self._path(key)
+
+    def relocate(self, root):
+        return LocalStorageBackend(root)
+
+
+class _Throttle:
+    """Limitador de ancho de banda (token bucket)"""
+
+    def __init__(self, bytes_per_sec=None):
+        self.rate = bytes_per_sec
+        self.allowance = float(bytes_per_sec or 0)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= n
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ObjectStoreError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status >= 500 or self.status in (408, 429)
+
+
+class _S3Client:
+    """Cliente mínimo S3 (firma AWS SigV4, path-style) sobre http.client"""
+
+    def __init__(self, endpoint, bucket, access_key, secret_key, region="us-east-1",
+                 throttle=None, timeout=30):
+        parts = urlsplit(endpoint)
+        self.secure = parts.scheme == "https"
+        self.host = parts.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.throttle = throttle or _Throttle()
+        self.timeout = timeout
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            self.conn = cls(self.host, timeout=self.timeout)
+        return self.conn
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def _sign(self, method, path, query, payload_hash):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = now.strftime("%Y%m%d")
+
+        canonical_query = "&".join(
+            f"{quote(k, safe='~')}={quote(str(v), safe='~')}" for k, v in sorted(query.items())
+        )
+        headers = {
+            "host": self.host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date
+        }
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{k}:{headers[k]}\n" for k in sorted(headers))
+        canonical_request = "\n".join([
+            method, path, canonical_query, canonical_headers, signed_headers, payload_hash
+        ])
+
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+
+        key = ("AWS4" + self.secret_key).encode()
+        for msg in (date, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, msg.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return headers, canonical_query
+
+    def request(self, method, key, query=None, body=b"", content_type=None):
+        """Envía una petición firmada reutilizando la conexión (keep-alive)"""
+        query = query or {}
+        path = "/" + quote(self.bucket) + ("/" + quote(key, safe="/~") if key else "")
+        headers, canonical_query = self._sign(
+            method, path, query, hashlib.sha256(body).hexdigest()
+        )
+        url = path + ("?" + canonical_query if canonical_query else "")
+
+        for attempt in range(2):
+            conn = self._connect()
+            try:
+                conn.putrequest(method, url, skip_host=True, skip_accept_encoding=True)
+                for name, value in headers.items():
+                    conn.putheader(name, value)
+                conn.putheader("Content-Length", str(len(body)))
+                if content_type:
+                    conn.putheader("Content-Type", content_type)
+                conn.endheaders()
+
+                # Enviar en bloques respetando el límite de ancho de banda
+                view = memoryview(body)
+                for offset in range(0, len(body), 64 * 1024):
+                    chunk = view[offset:offset + 64 * 1024]
+                    self.throttle.consume(len(chunk))
+                    conn.send(chunk)
+
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # La conexión keep-alive se cerró del lado del servidor: reconectar una vez
+                self.close()
+                if attempt:
+                    raise
+
+        if response.status >= 300:
+            raise ObjectStoreError(response.status, data[:200].decode(errors="replace"))
+        return response, data
+
+    def put_object(self, key, body, content_type=None):
+        response, _ = self.request("PUT", key, body=body, content_type=content_type)
+        return response.getheader("ETag")
+
+    def get_object(self, key):
+        _, data = self.request("GET", key)
+        return data
+
+    def delete_object(self, key):
+        self.request("DELETE", key)
+
+    def head_object(self, key):
+        """True si el objeto existe en el bucket"""
+        try:
+            self.request("HEAD", key)
+            return True
+        except ObjectStoreError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def list_objects(self, prefix=""):
+        """ListObjectsV2 de un nivel (delimitador "/"), paginando con continuation-token"""
+        items = []
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix, "delimiter": "/"}
+            if token:
+                query["continuation-token"] = token
+            _, data = self.request("GET", "", query)
+            root = ET.fromstring(data)
+            for node in root.findall("{*}Contents"):
+                modified = datetime.datetime.strptime(
+                    node.findtext("{*}LastModified")[:19], "%Y-%m-%dT%H:%M:%S"
+                ).replace(tzinfo=datetime.timezone.utc)
+                items.append({
+                    "key": node.findtext("{*}Key"),
+                    "size": int(node.findtext("{*}Size") or 0),
+                    "modified": modified.timestamp()
+                })
+            if root.findtext("{*}IsTruncated") != "true":
+                return items
+            token = root.findtext("{*}NextContinuationToken")
+
+    def create_multipart(self, key, content_type=None):
+        _, data = self.request("POST", key, {"uploads": ""}, content_type=content_type)
+        node = ET.fromstring(data).find("{*}UploadId")
+        return node.text
+
+    def upload_part(self, key, upload_id, number, body):
+        response, _ = self.request("PUT", key, {"partNumber": number, "uploadId": upload_id}, body)
+        return response.getheader("ETag")
+
+    def complete_multipart(self, key, upload_id, parts):
+        xml = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{p['number']}</PartNumber><ETag>{p['etag']}</ETag></Part>"
+            for p in parts
+        ) + "</CompleteMultipartUpload>"
+        self.request("POST", key, {"uploadId": upload_id}, xml.encode())
+
+
+class ObjectStoreBackend(StorageBackend):
+    """Backend compatible con S3 con bandeja de salida persistente.
+
+    Cada objeto se guarda primero en una caché local (LocalStorageBackend) y se
+    encola en el outbox en disco; un hilo en segundo plano lo sube. Así las
+    capturas sobreviven a cortes de red y se envían cuando vuelve la conexión.
+    """
+
+    def __init__(self, root, endpoint, bucket, access_key="", secret_key="",
+                 region="us-east-1", prefix="", outbox=None, keep_local=True,
+                 max_bytes_per_sec=None, batch_size=32,
+                 multipart_threshold=8 * 1024 * 1024, part_size=8 * 1024 * 1024,
+                 autostart=True):
+        self.cache = LocalStorageBackend(root)
+        self.endpoint = endpoint
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.keep_local = keep_local
+        self.batch_size = batch_size
+        self.multipart_threshold = multipart_threshold
+        # S3 exige partes de al menos 5 MiB (excepto la última)
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+
+        self.outbox = outbox or os.path.join(self.cache.root, ".outbox")
+        self.failed = os.path.join(self.outbox, "failed")
+        os.makedirs(self.failed, exist_ok=True)
+
+        self.client = _S3Client(endpoint, bucket, access_key, secret_key, region,
+                                throttle=_Throttle(max_bytes_per_sec))
+
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._client_lock = threading.Lock()  # la conexión HTTP no es thread-safe
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if autostart:
+            self.start()
+
+    # --- Claves remotas ---
+    def _remote_key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{self._remote_key(key)}"
+
+    # --- Interfaz StorageBackend ---
+    def put(self, key, data, content_type=None):
+        path = self.cache.put(key, data)
+        self._enqueue(key, path, content_type or _content_type(key), len(data))
+        # Sin keep_local la copia local se borra al subir: devolver la clave remota
+        return path if self.keep_local else self.uri(key)
+
+    def get(self, key):
+        path = self.cache.local_path(key)
+        if path:
+            return self.cache.get(key)
+        with self._client_lock:
+            return self.client.get_object(self._remote_key(key))
+
+    def exists(self, key):
+        if self.cache.exists(key):
+            return True
+        if self.keep_local:
+            return False
+        with self._client_lock:
+            return self.client.head_object(self._remote_key(key))
+
+    def delete(self, key):
+        self.cache.delete(key)
+        with self._client_lock:
+            self.client.delete_object(self._remote_key(key))
+
+    def list(self, prefix=""):
+        items = {item["key"]: item for item in self.cache.list(prefix)}
+        if self.keep_local:
+            return list(items.values())
+
+        # Sin copia local, lo ya subido solo está en el bucket
+        remote_prefix = self._remote_key(prefix.strip("/")) + "/" if prefix else \
+            (self.prefix + "/" if self.prefix else "")
+        try:
+            with self._client_lock:
+                remote = self.client.list_objects(remote_prefix)
+        except (OSError, http.client.HTTPException, ObjectStoreError) as e:
+            print(f"⚠️ No se pudo listar el almacén de objetos ({e}); solo copia local")
+            return list(items.values())
+
+        for item in remote:
+            key = item["key"][len(self.prefix) + 1:] if self.prefix else item["key"]
+            if key not in items:
+                items[key] = dict(item, key=key, path=self.uri(key))
+        return list(items.values())
+
+    def local_path(self, key):
+        return self.cache.local_path(key)
+
+    def relocate(self, root):
+        # El outbox guarda rutas absolutas, así que lo pendiente se sigue enviando
+        self.cache = LocalStorageBackend(root)
+        return self
+
+    # --- Outbox ---
+    def _enqueue(self, key, path, content_type, size):
+        with self._lock:
+            self._seq += 1
+            entry_id = f"{time.time_ns():020d}_{self._seq:06d}"
+        entry = {
+            "key": key,
+            "path": path,
+            "content_type": content_type,
+            "size": size,
+            "created": datetime.datetime.now().isoformat(),
+            "upload_id": None,
+            "parts": []
+        }
+        self._write_entry(os.path.join(self.outbox, entry_id + ".json"), entry)
+        self._wakeup.set()
+
+    def _write_entry(self, entry_path, entry):
+        tmp_path = entry_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, entry_path)
+
+    def pending(self):
+        """Lista (ordenada) de entradas pendientes en el outbox"""
+        return sorted(
+            os.path.join(self.outbox, f) for f in os.listdir(self.outbox) if f.endswith(".json")
+        )
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._drain_loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.client.close()
+
+    def _drain_loop(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                sent = self.drain(limit=self.batch_size)
+                backoff = 1
+                if sent:
+                    continue
+                # Nada pendiente: esperar a nuevas capturas
+                self._wakeup.wait(timeout=30)
+                self._wakeup.clear()
+            except (OSError, http.client.HTTPException, ObjectStoreError) as e:
+                print(f"⚠️ Sin conexión con el almacén de objetos ({e}); reintento en {backoff}s")
+                self.client.close()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 300)
+
+    def drain(self, limit=None):
+        """Sube un lote de entradas pendientes; retorna cuántas se enviaron.
+
+        Los objetos pequeños se envían en lote sobre una misma conexión y los
+        grandes con multipart upload (reanudable entre reinicios).
+        """
+        sent = 0
+        for entry_path in self.pending()[:limit]:
+            if self._stop.is_set():
+                break
+            try:
+                with open(entry_path, 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            if not os.path.exists(entry["path"]):
+                print(f"⚠️ Archivo pendiente no encontrado, se descarta: {entry['path']}")
+                os.remove(entry_path)
+                continue
+
+            try:
+                with self._client_lock:
+                    if entry["size"] >= self.multipart_threshold:
+                        self._upload_multipart(entry_path, entry)
+                    else:
+                        with open(entry["path"], 'rb') as f:
+                            body = f.read()
+                        self.client.put_object(self._remote_key(entry["key"]), body,
+                                               entry["content_type"])
+            except ObjectStoreError as e:
+                if e.retryable:
+                    raise
+                # Error permanente (credenciales, bucket...): apartar la entrada
+                print(f"❌ Error al subir {entry['key']}: {e}")
+                os.replace(entry_path, os.path.join(self.failed, os.path.basename(entry_path)))
+                continue
+
+            os.remove(entry_path)
+            if not self.keep_local and os.path.exists(entry["path"]):
+                os.remove(entry["path"])
+            sent += 1
+        return sent
+
+    def _upload_multipart(self, entry_path, entry, restart=True):
+        remote_key = self._remote_key(entry["key"])
+        if not entry["upload_id"]:
+            entry["upload_id"] = self.client.create_multipart(remote_key, entry["content_type"])
+            entry["parts"] = []
+            self._write_entry(entry_path, entry)
+
+        with open(entry["path"], 'rb') as f:
+            number = len(entry["parts"]) + 1
+            f.seek((number - 1) * self.part_size)
+            while True:
+                chunk = f.read(self.part_size)
+                if not chunk:
+                    break
+                try:
+                    etag = self.client.upload_part(remote_key, entry["upload_id"], number, chunk)
+                except ObjectStoreError as e:
+                    if e.status == 404 and restart:
+                        # La subida expiró en el servidor: empezar de nuevo
+                        entry["upload_id"] = None
+                        self._write_entry(entry_path, entry)
+                        return self._upload_multipart(entry_path, entry, restart=False)
+                    raise
+                # Guardar progreso tras cada parte para poder reanudar
+                entry["parts"].append({"number": number, "etag": etag})
+                self._write_entry(entry_path, entry)
+                number += 1
+
+        self.client.complete_multipart(remote_key, entry["upload_id"], entry["parts"])
+
+
+def create_backend(config, root):
+    """Crea el backend indicado en la sección "storage" de la configuración"""
+    config = config or {}
+    kind = config.get("backend", "local")
+
+    if kind == "local":
+        return LocalStorageBackend(root)
+    if kind == "s3":
+        options = dict(config.get("s3", {}))
+        return ObjectStoreBackend(root, **options)
+
+    raise ValueError(f"Backend de almacenamiento no soportado: {kind}")
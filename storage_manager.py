@@ -4,14 +4,37 @@ import datetime
 from tkinter import filedialog
 import shutil  # Reemplaza algunas operaciones de archivos
 
+from storage_backends import LocalStorageBackend, encode_image, IMAGE_EXTENSIONS
+from frame_stages import apply_transform, to_full_frame
+from content_store import ContentStore
+
 class StorageManager:
-    def __init__(self, base_folder=None):
+    # Claves (relativas al backend) de cada subcarpeta
+    KEYS = {
+        "images": "images",
+        "annotations": "annotations",
+        "exports": "exports",
+        "yolo": "exports/yolo",
+        "coco": "exports/coco"
+    }
+    
+    # Clases por defecto (índice YOLO / category_id COCO -> nombre)
+    DEFAULT_CLASSES = {
+        0: "defecto",
+        1: "correcto"
+    }
+
+    def __init__(self, base_folder=None, backend=None, content_addressed=False, station_id=None):
         if base_folder:
             self.folder = base_folder
         else:
             self.folder = os.path.join(os.getcwd(), "capturas")
         
         os.makedirs(self.folder, exist_ok=True)
+        self.backend = backend or LocalStorageBackend(self.folder)
+        # Imágenes por contenido (objects/<hash>) con manifiesto de la estación
+        self.content_store = ContentStore(self.backend, self.folder, station_id) \
+            if content_addressed else None
         
         # Crear estructura de carpetas
         self.subfolders = {
@@ -34,47 +57,48 @@ class StorageManager:
         path = filedialog.askdirectory(initialdir=self.folder)
         if path:
             self.folder = path
+            self.backend = self.backend.relocate(path)
+            if self.content_store:
+                self.content_store.relocate(self.backend, path)
             # Recrear estructura en nueva ubicación
             for key in self.subfolders.keys():
-                new_sub = os.path.join(path, *key.split('/')) if '/' in key else os.path.join(path, key)
+                new_sub = os.path.join(path, *self.KEYS[key].split('/'))
                 os.makedirs(new_sub, exist_ok=True)
                 self.subfolders[key] = new_sub
         return self.folder
 
-    def save_image(self, image, serial, metadata=None):
-        """Guarda una imagen con metadatos"""
+    def save_image(self, image, serial, metadata=None, transform=None):
+        """Guarda una imagen con metadatos.
+
+        transform (ver frame_stages.make_transform) recorta/reduce la imagen
+        antes de codificar y queda registrado en los metadatos.
+        """
         now = datetime.datetime.now()
         
-        # Nombre de archivo
-        filename = f"{serial}_{now.strftime('%Y%m%d_%H%M%S')}.png"
-        image_path = os.path.join(self.subfolders["images"], filename)
+        if transform:
+            image = apply_transform(image, transform)
+            metadata = dict(metadata or {})
+            metadata["transform"] = transform
+        
+        # Nombre de archivo (con milisegundos para no pisar capturas del mismo segundo)
+        stamp = f"{now.strftime('%Y%m%d_%H%M%S')}{now.microsecond // 1000:03d}"
+        filename = f"{serial}_{stamp}.png"
         
-        # Guardar imagen
+        # Guardar imagen a través del backend
+        digest = None
         try:
-            import cv2
-            import numpy as np
-            
-            # Si la imagen es un array de numpy (OpenCV)
-            if isinstance(image, np.ndarray):
-                cv2.imwrite(image_path, image)
+            data = encode_image(image, ".png")
+            if self.content_store:
+                image_path, digest = self.content_store.put(data, filename, "image/png")
             else:
-                # Asumir que es PIL Image
-                image.save(image_path)
+                image_path = self.backend.put(f"{self.KEYS['images']}/{filename}", data)
         except Exception as e:
-            # Fallback simple
-            try:
-                if hasattr(image, 'save'):
-                    image.save(image_path)
-                else:
-                    raise ValueError(f"Formato de imagen no soportado: {type(image)}")
-            except Exception as e2:
-                print(f"Error al guardar imagen: {e2}")
-                return None
+            print(f"Error al guardar imagen: {e}")
+            return None
         
         # Guardar metadatos si se proporcionan
         if metadata:
-            meta_filename = f"{serial}_{now.strftime('%Y%m%d_%H%M%S')}.json"
-            meta_path = os.path.join(self.subfolders["annotations"], meta_filename)
+            meta_filename = f"{serial}_{stamp}.json"
             
             metadata.update({
                 "image_path": image_path,
@@ -82,69 +106,151 @@ class StorageManager:
                 "timestamp": now.isoformat(),
                 "filename": filename
             })
+            if digest:
+                metadata["blake2b"] = digest
             
             try:
-                with open(meta_path, 'w') as f:
-                    json.dump(metadata, f, indent=2)
+                self._put_json(f"{self.KEYS['annotations']}/{meta_filename}", metadata)
             except Exception as e:
                 print(f"Error al guardar metadatos: {e}")
         
         return image_path
 
-    def save_annotation(self, image_path, annotations, format="yolo"):
-        """Guarda anotaciones en diferentes formatos"""
+    def _put_json(self, key, data):
+        """Serializa y guarda un JSON a través del backend"""
+        return self.backend.put(key, json.dumps(data, indent=2).encode('utf-8'),
+                                "application/json")
+
+    def save_annotation(self, image_path, annotations, format="yolo", transform=None):
+        """Guarda anotaciones en diferentes formatos.
+
+        Si la imagen se guardó recortada (ROI) o reducida, las cajas se
+        convierten a coordenadas del frame completo. Con content_addressed,
+        image_path puede ser el objeto (objects/ab/<hash>.png) o el nombre
+        original; las etiquetas y metadatos usan siempre el nombre original.
+        """
         # Obtener nombre base del archivo
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        base_name, file_name, image_path = self._resolve_image(image_path)
+        
+        image_size = None
+        transform = transform or self._load_transform(base_name)
+        if transform:
+            annotations = [self._box_to_full_frame(ann, transform) for ann in annotations]
+            image_size = tuple(transform["full_size"])
         
         if format.lower() == "yolo":
-            return self._save_yolo_annotation(base_name, annotations, image_path)
+            return self._save_yolo_annotation(base_name, annotations, image_path, image_size)
         elif format.lower() == "coco":
-            return self._save_coco_annotation(base_name, annotations, image_path)
+            return self._save_coco_annotation(base_name, annotations, image_path, image_size,
+                                              file_name)
         else:
             raise ValueError(f"Formato de anotación no soportado: {format}")
 
-    def _save_yolo_annotation(self, base_name, annotations, image_path):
+    def _resolve_image(self, image_path):
+        """(nombre base, nombre de archivo, ruta legible) de una captura"""
+        file_name = os.path.basename(image_path)
+        if self.content_store:
+            entry = self.content_store.lookup(file_name)
+            if entry:
+                # Nombre original: leer la imagen desde su objeto
+                image_path = self.backend.local_path(entry["key"]) or image_path
+            else:
+                # Ruta del objeto: el hash se traduce al nombre original
+                file_name = self.content_store.name_of(os.path.splitext(file_name)[0]) or file_name
+        return os.path.splitext(file_name)[0], file_name, image_path
+
+    def content_image_paths(self):
+        """{nombre base original: ruta local del objeto} de las capturas por contenido"""
+        if not self.content_store:
+            return {}
+        paths = {}
+        for name, entry in self.content_store.names().items():
+            path = self.backend.local_path(entry["key"])
+            if path:
+                paths[os.path.splitext(name)[0]] = path
+        return paths
+
+    def frame_sizes(self):
+        """{nombre base: (ancho, alto)} del frame completo de las capturas con ROI/reducción.
+
+        Las etiquetas de esas capturas están en coordenadas del frame completo.
+        """
+        sizes = {}
+        for item in self.backend.list(self.KEYS["annotations"]):
+            if not item["key"].endswith(".json"):
+                continue
+            try:
+                transform = json.loads(self.backend.get(item["key"])).get("transform")
+            except Exception as e:
+                print(f"Error al leer metadatos {item['key']}: {e}")
+                continue
+            if transform and transform.get("full_size"):
+                stem = os.path.splitext(os.path.basename(item["key"]))[0]
+                sizes[stem] = tuple(transform["full_size"])
+        return sizes
+
+    def _load_transform(self, base_name):
+        """Busca el ROI/reducción registrado en los metadatos de la imagen"""
+        key = f"{self.KEYS['annotations']}/{base_name}.json"
+        try:
+            if self.backend.exists(key):
+                return json.loads(self.backend.get(key)).get("transform")
+        except Exception as e:
+            print(f"Error al leer metadatos: {e}")
+        return None
+
+    def _box_to_full_frame(self, ann, transform):
+        """Copia de la anotación con la caja en coordenadas del frame completo"""
+        box = (ann.get("x_min", 0), ann.get("y_min", 0), ann.get("x_max", 0), ann.get("y_max", 0))
+        x_min, y_min, x_max, y_max = to_full_frame(box, transform)
+        return dict(ann, x_min=x_min, y_min=y_min, x_max=x_max, y_max=y_max)
+
+    def _save_yolo_annotation(self, base_name, annotations, image_path, image_size=None):
         """Guarda anotaciones en formato YOLO"""
         # Formato YOLO: class_id x_center y_center width height (normalizado 0-1)
         
         # Primero obtener dimensiones de la imagen
-        try:
-            import cv2
-            img = cv2.imread(image_path)
-            if img is None:
-                return None
-            img_height, img_width = img.shape[:2]
-        except:
-            # Si no podemos leer la imagen, usar valores por defecto
-            img_width, img_height = 640, 480
+        if image_size:
+            img_width, img_height = image_size
+        else:
+            try:
+                import cv2
+                img = cv2.imread(image_path)
+                if img is None:
+                    return None
+                img_height, img_width = img.shape[:2]
+            except:
+                # Si no podemos leer la imagen, usar valores por defecto
+                img_width, img_height = 640, 480
         
         # Crear archivo .txt
-        txt_path = os.path.join(self.subfolders["yolo"], "labels", f"{base_name}.txt")
-        os.makedirs(os.path.dirname(txt_path), exist_ok=True)
-        
-        with open(txt_path, 'w') as f:
-            for ann in annotations:
-                # ann debe ser dict con: class_id, x_min, y_min, x_max, y_max
-                class_id = ann.get("class_id", 0)
-                
-                # Convertir coordenadas absolutas a normalizadas
-                x_min = ann.get("x_min", 0)
-                y_min = ann.get("y_min", 0)
-                x_max = ann.get("x_max", 0)
-                y_max = ann.get("y_max", 0)
-                
-                # Calcular valores normalizados
-                x_center = ((x_min + x_max) / 2) / img_width
-                y_center = ((y_min + y_max) / 2) / img_height
-                width = (x_max - x_min) / img_width
-                height = (y_max - y_min) / img_height
-                
-                # Escribir línea en formato YOLO
-                f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
+        lines = []
+        for ann in annotations:
+            # ann debe ser dict con: class_id, x_min, y_min, x_max, y_max
+            class_id = ann.get("class_id", 0)
+            
+            # Convertir coordenadas absolutas a normalizadas
+            x_min = ann.get("x_min", 0)
+            y_min = ann.get("y_min", 0)
+            x_max = ann.get("x_max", 0)
+            y_max = ann.get("y_max", 0)
+            
+            # Calcular valores normalizados
+            x_center = ((x_min + x_max) / 2) / img_width
+            y_center = ((y_min + y_max) / 2) / img_height
+            width = (x_max - x_min) / img_width
+            height = (y_max - y_min) / img_height
+            
+            # Escribir línea en formato YOLO
+            lines.append(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
+        
+        txt_key = f"{self.KEYS['yolo']}/labels/{base_name}.txt"
+        txt_path = self.backend.put(txt_key, "".join(lines).encode('utf-8'), "text/plain")
         
         return txt_path
 
-    def _save_coco_annotation(self, base_name, annotations, image_path):
+    def _save_coco_annotation(self, base_name, annotations, image_path, image_size=None,
+                              file_name=None):
         """Guarda anotaciones en formato COCO (simplificado)"""
         # Esto es una versión simplificada del formato COCO
         import json
@@ -171,16 +277,19 @@ class StorageManager:
         coco_data["categories"] = categories
         
         # Añadir información de la imagen
-        try:
-            import cv2
-            img = cv2.imread(image_path)
-            img_height, img_width = img.shape[:2]
-        except:
-            img_width, img_height = 640, 480
+        if image_size:
+            img_width, img_height = image_size
+        else:
+            try:
+                import cv2
+                img = cv2.imread(image_path)
+                img_height, img_width = img.shape[:2]
+            except:
+                img_width, img_height = 640, 480
         
         image_info = {
             "id": 1,  # Debería ser único por imagen
-            "file_name": os.path.basename(image_path),
+            "file_name": file_name or os.path.basename(image_path),
             "width": img_width,
             "height": img_height,
             "date_captured": datetime.datetime.now().isoformat()
@@ -205,11 +314,7 @@ class StorageManager:
             coco_data["annotations"].append(annotation)
         
         # Guardar archivo JSON
-        json_path = os.path.join(self.subfolders["coco"], f"{base_name}.json")
-        os.makedirs(os.path.dirname(json_path), exist_ok=True)
-        
-        with open(json_path, 'w') as f:
-            json.dump(coco_data, f, indent=2)
+        json_path = self._put_json(f"{self.KEYS['coco']}/{base_name}.json", coco_data)
         
         return json_path
 
@@ -234,10 +339,7 @@ class StorageManager:
         
         # Configurar clases por defecto si no se proporcionan
         if classes is None:
-            classes = {
-                0: "defecto",
-                1: "correcto"
-            }
+            classes = dict(self.DEFAULT_CLASSES)
         
         # Crear dataset.yaml
         dataset_yaml = f"""# Dataset YOLO generado automáticamente
@@ -253,9 +355,8 @@ nc: {len(classes)}
 names: {classes}
 """
         
-        yaml_path = os.path.join(yolo_folder, "dataset.yaml")
-        with open(yaml_path, 'w', encoding='utf-8') as f:
-            f.write(dataset_yaml)
+        yaml_path = self.backend.put(f"{self.KEYS['yolo']}/dataset.yaml",
+                                     dataset_yaml.encode('utf-8'), "text/yaml")
         
         print(f"✅ Estructura YOLO creada en: {yolo_folder}")
         print(f"📄 Configuración guardada en: {yaml_path}")
@@ -268,16 +369,12 @@ names: {classes}
         
         # Configurar clases por defecto
         if classes is None:
-            classes = {
-                0: "defecto",
-                1: "correcto"
-            }
+            classes = dict(self.DEFAULT_CLASSES)
         
         # Crear archivo de clases
-        classes_path = os.path.join(coco_folder, "classes.txt")
-        with open(classes_path, 'w', encoding='utf-8') as f:
-            for class_id, class_name in classes.items():
-                f.write(f"{class_id}:{class_name}\n")
+        classes_txt = "".join(f"{class_id}:{class_name}\n" for class_id, class_name in classes.items())
+        classes_path = self.backend.put(f"{self.KEYS['coco']}/classes.txt",
+                                        classes_txt.encode('utf-8'), "text/plain")
         
         print(f"✅ Estructura COCO creada en: {coco_folder}")
         print(f"📄 Archivo de clases en: {classes_path}")
@@ -286,29 +383,43 @@ names: {classes}
 
     def list_images(self, folder="images"):
         """Lista todas las imágenes en una carpeta"""
-        images_path = self.subfolders.get(folder, folder)
-        
-        if not os.path.exists(images_path):
-            return []
+        prefix = self.KEYS.get(folder, folder)
         
-        image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif'}
         images = []
         
-        for file in os.listdir(images_path):
-            if os.path.splitext(file)[1].lower() in image_extensions:
+        for item in self.backend.list(prefix):
+            file = os.path.basename(item["key"])
+            if os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS:
                 images.append({
                     "filename": file,
-                    "path": os.path.join(images_path, file),
-                    "size": os.path.getsize(os.path.join(images_path, file)),
+                    "path": item["path"],
+                    "size": item["size"],
                     "modified": datetime.datetime.fromtimestamp(
-                        os.path.getmtime(os.path.join(images_path, file))
+                        item["modified"]
+                    ).strftime('%Y-%m-%d %H:%M:%S')
+                })
+        
+        if folder == "images" and self.content_store:
+            # Capturas guardadas por contenido: se listan desde el manifiesto
+            for entry in self.content_store.names().values():
+                images.append({
+                    "filename": entry["name"],
+                    "path": self.backend.local_path(entry["key"]) or self.backend.uri(entry["key"]),
+                    "size": entry["size"],
+                    "modified": datetime.datetime.fromtimestamp(
+                        entry["timestamp"]
                     ).strftime('%Y-%m-%d %H:%M:%S')
                 })
         
         return images
 
-    def get_statistics(self):
-        """Obtiene estadísticas del dataset"""
+    def get_statistics(self, scan_labels=True, workers=None):
+        """Obtiene estadísticas del dataset.
+
+        Con scan_labels se parsean todas las etiquetas YOLO y exportaciones
+        COCO (en paralelo, con caché por mtime) para llenar by_class,
+        histogramas de cajas e imágenes por serial.
+        """
         stats = {
             "total_images": 0,
             "total_annotations": 0,
@@ -324,23 +435,33 @@ names: {classes}
         stats["storage_size"] = sum(img["size"] for img in images)
         
         # Contar anotaciones (simplificado)
-        annotations_path = self.subfolders["annotations"]
-        if os.path.exists(annotations_path):
-            annotation_files = [f for f in os.listdir(annotations_path) if f.endswith('.json')]
-            stats["total_annotations"] = len(annotation_files)
+        annotation_files = [item for item in self.backend.list(self.KEYS["annotations"])
+                            if item["key"].endswith('.json')]
+        stats["total_annotations"] = len(annotation_files)
+        
+        if scan_labels:
+            from dataset_stats import DatasetScanner, load_class_names
+            
+            class_names = load_class_names(self.subfolders["yolo"]) or self.DEFAULT_CLASSES
+            scanner = DatasetScanner(self.folder,
+                                     [self.subfolders["yolo"], self.subfolders["coco"]],
+                                     image_files=[img["filename"] for img in images],
+                                     workers=workers, class_names=class_names)
+            stats.update(scanner.scan())
         
         return stats
 
 # --- Versión simplificada (si solo necesitas lo básico) ---
 class SimpleStorageManager:
     """Versión simplificada sin dependencias extras"""
-    def __init__(self, base_folder=None):
+    def __init__(self, base_folder=None, backend=None):
         if base_folder:
             self.folder = base_folder
         else:
             self.folder = os.path.join(os.getcwd(), "capturas")
         
         os.makedirs(self.folder, exist_ok=True)
+        self.backend = backend or LocalStorageBackend(self.folder)
     
     def get_path(self):
         return self.folder
@@ -350,35 +471,17 @@ class SimpleStorageManager:
         if path:
             self.folder = path
             os.makedirs(path, exist_ok=True)
+            self.backend = self.backend.relocate(path)
         return self.folder
     
     def save_image(self, image, serial):
         """Guarda una imagen - versión simple"""
         now = datetime.datetime.now()
-        filename = f"{serial}_{now.strftime('%Y%m%d_%H%M%S')}.png"
-        path = os.path.join(self.folder, filename)
+        filename = f"{serial}_{now.strftime('%Y%m%d_%H%M%S')}{now.microsecond // 1000:03d}.png"
         
         try:
-            # Intentar guardar con OpenCV si está disponible
-            import cv2
-            if hasattr(cv2, 'imwrite'):
-                cv2.imwrite(path, image)
-                return path
-        except:
-            pass
-        
-        # Fallback: usar PIL si está disponible
-        try:
-            from PIL import Image
-            if isinstance(image, Image.Image):
-                image.save(path)
-            return path
-        except:
-            # Si todo falla, guardar como archivo binario
-            try:
-                with open(path, 'wb') as f:
-                    f.write(image)
-                return path
-            except Exception as e:
-                print(f"Error crítico al guardar imagen: {e}")
-                return None
\ No newline at end of file
+            # OpenCV, luego PIL; si ya son bytes se guardan tal cual
+            return self.backend.put(filename, encode_image(image, ".png"))
+        except Exception as e:
+            print(f"Error crítico al guardar imagen: {e}")
+            return None
@@ -0,0 +1,157 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+import s3_stub
+from storage_backends import ObjectStoreBackend
+
+# Pruebas de ObjectStoreBackend contra el servidor S3 mínimo (s3_stub), sin red.
+# Ejecutar con: python -m pytest -q  (o python -m unittest test_storage_backends)
+
+BUCKET = "capturas"
+MIB = 1024 * 1024
+
+
+def _closed_port():
+    """Puerto local sin nadie escuchando (la conexión se rechaza)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _DenyHandler(s3_stub.StubHandler):
+    """Rechaza con 403 las subidas bajo denied/ (error permanente)"""
+
+    def do_PUT(self):
+        if self.path.startswith(f"/{BUCKET}/denied/"):
+            self._parse()  # Consumir el cuerpo antes de responder
+            return self._error(403, "AccessDenied")
+        super().do_PUT()
+
+
+class ObjectStoreBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.servers = []
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.close()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.tmp.cleanup()
+
+    def _stub(self, **kwargs):
+        server, endpoint = s3_stub.start_stub(**kwargs)
+        self.servers.append(server)
+        return server.RequestHandlerClass.store, endpoint
+
+    def _backend(self, endpoint, **kwargs):
+        # Sin hilo de fondo: las pruebas llaman drain() directamente
+        backend = ObjectStoreBackend(self.root, endpoint, BUCKET, "clave", "secreto",
+                                     autostart=False, **kwargs)
+        self.backends.append(backend)
+        return backend
+
+    def test_put_then_drain_uploads_and_empties_outbox(self):
+        store, endpoint = self._stub()
+        backend = self._backend(endpoint)
+
+        path = backend.put("images/P1_20240101_101010123.png", b"png-bytes")
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(backend.pending()), 1)
+
+        self.assertEqual(backend.drain(), 1)
+        self.assertEqual(backend.pending(), [])
+        self.assertEqual(store.get(BUCKET, "images/P1_20240101_101010123.png")[0], b"png-bytes")
+
+    def test_multipart_resumes_after_interrupted_part(self):
+        store, endpoint = self._stub()
+        backend = self._backend(endpoint, multipart_threshold=MIB, part_size=5 * MIB)
+        data = os.urandom(11 * MIB)  # 3 partes de 5, 5 y 1 MiB
+        backend.put("videos/seg.mp4", data)
+
+        # La segunda parte se corta a mitad de camino
+        upload_part = backend.client.upload_part
+
+        def flaky_upload(key, upload_id, number, body):
+            if number == 2:
+                raise ConnectionResetError("corte simulado")
+            return upload_part(key, upload_id, number, body)
+
+        backend.client.upload_part = flaky_upload
+        with self.assertRaises(ConnectionResetError):
+            backend.drain()
+        self.assertIsNone(store.get(BUCKET, "videos/seg.mp4"))
+        self.assertEqual(len(backend.pending()), 1)
+
+        # Un backend nuevo (reinicio de la app) retoma desde la parte 2
+        resumed = self._backend(endpoint, multipart_threshold=MIB, part_size=5 * MIB)
+        resumed_upload = resumed.client.upload_part
+        numbers = []
+
+        def record_upload(key, upload_id, number, body):
+            numbers.append(number)
+            return resumed_upload(key, upload_id, number, body)
+
+        resumed.client.upload_part = record_upload
+        self.assertEqual(resumed.drain(), 1)
+        self.assertEqual(numbers, [2, 3])
+        self.assertEqual(store.get(BUCKET, "videos/seg.mp4")[0], data)
+
+    def test_list_without_keep_local_reads_paginated_bucket(self):
+        _, endpoint = self._stub(page_size=2)
+        backend = self._backend(endpoint, keep_local=False)
+
+        names = [f"P{i}_20240101_10101{i}000.png" for i in range(5)]
+        for name in names:
+            self.assertEqual(backend.put(f"images/{name}", b"x"), f"s3://{BUCKET}/images/{name}")
+        backend.put("annotations/P0.json", b"{}")
+        self.assertEqual(backend.drain(), 6)
+        self.assertEqual(os.listdir(os.path.join(self.root, "images")), [])
+
+        items = backend.list("images")
+        self.assertEqual(sorted(item["key"] for item in items),
+                         [f"images/{name}" for name in names])
+        self.assertTrue(all(item["path"].startswith(f"s3://{BUCKET}/") for item in items))
+
+    def test_outbox_survives_refused_connection(self):
+        backend = self._backend(f"http://127.0.0.1:{_closed_port()}")
+        backend.put("images/P1.png", b"offline")
+
+        with self.assertRaises(OSError):
+            backend.drain()
+        self.assertEqual(len(backend.pending()), 1)
+
+        # Vuelve la red (servidor disponible): lo pendiente se envía
+        store, endpoint = self._stub()
+        backend = self._backend(endpoint)
+        self.assertEqual(backend.drain(), 1)
+        self.assertEqual(store.get(BUCKET, "images/P1.png")[0], b"offline")
+
+    def test_permanent_error_moves_entry_to_failed(self):
+        handler = type("Handler", (_DenyHandler,), {"store": s3_stub.StubStore()})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        backend = self._backend(f"http://127.0.0.1:{server.server_port}")
+
+        backend.put("denied/P1.png", b"x")
+        backend.put("images/P2.png", b"y")
+        self.assertEqual(backend.drain(), 1)
+
+        self.assertEqual(backend.pending(), [])
+        self.assertEqual(len(os.listdir(backend.failed)), 1)
+        self.assertIsNone(handler.store.get(BUCKET, "denied/P1.png"))
+        self.assertEqual(handler.store.get(BUCKET, "images/P2.png")[0], b"y")
+
+
+if __name__ == "__main__":
+    unittest.main()